@@ -1,11 +1,11 @@
 # src/anomaly_model.py
+import os
 import numpy as np
-import joblib
-from sklearn.ensemble import IsolationForest
 from pathlib import Path
 
+from src.utils.locks import FileLock
+
 MODEL_PATH = Path("outputs") / "models"
-MODEL_PATH.mkdir(parents=True, exist_ok=True)
 
 class IsolationAnomaly:
     def __init__(self, model_file=None):
@@ -17,13 +17,15 @@ class IsolationAnomaly:
         X: numpy array shape (n_samples, n_features) — features from normal clips
         contamination: expected fraction of anomalies in training (keep small)
         """
+        from sklearn.ensemble import IsolationForest
         self.model = IsolationForest(n_estimators=n_estimators, contamination=contamination, random_state=random_state)
         self.model.fit(X)
-        joblib.dump(self.model, str(self.model_file))
+        self.save()
         return self.model
 
     def load(self):
         if Path(self.model_file).exists():
+            import joblib
             self.model = joblib.load(str(self.model_file))
         else:
             raise FileNotFoundError(f"Model not found at {self.model_file}")
@@ -49,5 +51,330 @@ class IsolationAnomaly:
         return (preds == -1)
 
     def save(self, path=None):
-        p = Path(path) if path is not None else self.model_file
+        import joblib
+        p = Path(path) if path is not None else Path(self.model_file)
+        p.parent.mkdir(parents=True, exist_ok=True)
         joblib.dump(self.model, str(p))
+
+class HalfSpaceTrees:
+    """
+    Streaming anomaly detector (Half-Space Trees, Tan et al. 2011) with the same
+    score_samples/predict interface as IsolationAnomaly, plus learn() for
+    incremental updates as footage arrives.
+
+    Fixed memory: n_trees complete binary trees of `depth` levels, each node
+    holding a reference mass (previous window) and a latest mass (current window).
+    learn() adds a sample to the latest mass along its path in every tree,
+    O(n_trees * depth) per sample; every `window_size` samples latest becomes
+    reference. A sample is anomalous when it falls in little-visited regions.
+    Features are log1p-compressed (trajectory_features are all >= 0) and the
+    work space is set from the first window of samples.
+
+    Several processes (batch workers) can share one model file: save() merges
+    the mass learned since this process last loaded or saved into the file,
+    like HeatmapAccumulator.flush(), instead of overwriting it.
+    """
+    def __init__(self, model_file=None, camera="default", n_trees=25, depth=10, window_size=250,
+                 contamination=0.01, random_state=42):
+        self.model_file = model_file if model_file is not None else MODEL_PATH / f"hst_{camera}.npz"
+        self.n_trees = int(n_trees)
+        self.depth = int(depth)
+        self.window_size = int(window_size)
+        self.contamination = float(contamination)
+        self.rng = np.random.default_rng(random_state)
+        self.size_limit = 0.1 * self.window_size
+        self.split_dim = None          # (n_trees, n_internal) feature per internal node
+        self.split_val = None
+        self.ref = None                # (n_trees, n_nodes) reference mass
+        self.latest = None             # (n_trees, n_nodes) mass of the current window
+        self.seen = 0                  # samples learned in the current window
+        self.windows = 0               # completed windows (0 = no reference yet)
+        self.warmup = []               # first window, kept only until the trees are built
+        self.recent_scores = np.zeros(0, dtype=np.float32)   # ring of recent scores, for the default threshold
+        self._score_pos = 0
+        self.added = None              # mass learned since the last load/save, merged into the file on save
+        self.added_n = 0
+        self.version = 0               # file version this state was last synced with
+
+    @staticmethod
+    def _transform(X):
+        return np.log1p(np.maximum(np.asarray(X, dtype=np.float64), 0.0))
+
+    def _build(self, Z):
+        """Random half-space splits over a work space derived from the warm-up window."""
+        n_internal = 2 ** self.depth - 1
+        lo, hi = Z.min(axis=0), Z.max(axis=0)
+        hi = np.where(hi > lo, hi, lo + 1.0)
+        self.split_dim = np.zeros((self.n_trees, n_internal), dtype=np.int64)
+        self.split_val = np.zeros((self.n_trees, n_internal), dtype=np.float64)
+        for t in range(self.n_trees):
+            s = self.rng.uniform(lo, hi)
+            half = 2.0 * np.maximum(s - lo, hi - s)
+            mins, maxs = [s - half], [s + half]       # per-node work space, breadth first
+            for node in range(n_internal):
+                q = int(self.rng.integers(Z.shape[1]))
+                mid = (mins[node][q] + maxs[node][q]) / 2.0
+                self.split_dim[t, node], self.split_val[t, node] = q, mid
+                left_max, right_min = maxs[node].copy(), mins[node].copy()
+                left_max[q], right_min[q] = mid, mid
+                mins += [mins[node], right_min]
+                maxs += [left_max, maxs[node]]
+        n_nodes = 2 ** (self.depth + 1) - 1
+        self.ref = np.zeros((self.n_trees, n_nodes), dtype=np.float64)
+        self.latest = np.zeros((self.n_trees, n_nodes), dtype=np.float64)
+        self.added = np.zeros_like(self.latest)
+
+    def _paths(self, Z):
+        """(n_trees, n, depth+1) node index at every level for every sample."""
+        n = len(Z)
+        trees = np.arange(self.n_trees)[:, None]
+        node = np.zeros((self.n_trees, n), dtype=np.int64)
+        paths = [node]
+        for _ in range(self.depth):
+            dim = self.split_dim[trees, node]
+            right = Z[np.arange(n)[None, :], dim] > self.split_val[trees, node]
+            node = 2 * node + 1 + right
+            paths.append(node)
+        return np.stack(paths, axis=2)
+
+    def learn(self, X):
+        """Update the model with new (normal-dominated) samples, shape (n, n_features)."""
+        if len(X) == 0:
+            return
+        Z = self._transform(X).reshape(len(X), -1)
+        if self.split_dim is None:
+            self.warmup.extend(Z)
+            if len(self.warmup) < self.window_size:
+                return
+            Z = np.array(self.warmup)
+            self.warmup = []
+            self._build(Z)
+        if self.windows:
+            self._remember(self._score(Z))
+        trees = np.arange(self.n_trees)[:, None]
+        # in window-sized pieces so the reference is swapped exactly every window_size samples
+        while len(Z):
+            take = self.window_size - self.seen
+            paths = self._paths(Z[:take])
+            for level in range(self.depth + 1):
+                idx = (np.broadcast_to(trees, paths[:, :, level].shape), paths[:, :, level])
+                np.add.at(self.latest, idx, 1.0)
+                np.add.at(self.added, idx, 1.0)
+            self.seen += len(Z[:take])
+            self.added_n += len(Z[:take])
+            Z = Z[take:]
+            if self.seen == self.window_size:
+                self.ref, self.latest = self.latest, np.zeros_like(self.latest)
+                self.seen = 0
+                self.windows += 1
+
+    partial_fit = learn
+
+    def _score(self, Z):
+        """Mass score per sample (higher = more normal)."""
+        paths = self._paths(Z)
+        mass = np.take_along_axis(self.ref[:, None, :], paths, axis=2)           # (trees, n, depth+1)
+        levels = np.arange(self.depth + 1)
+        # stop at the first node below size_limit, or at the leaf
+        small = mass <= self.size_limit
+        stop = np.where(small.any(axis=2), small.argmax(axis=2), self.depth)
+        m = np.take_along_axis(mass, stop[..., None], axis=2)[..., 0]
+        return (m * 2.0 ** levels[stop]).sum(axis=0) / (self.n_trees * self.window_size * 2.0 ** self.depth)
+
+    def _remember(self, scores, keep=1024):
+        anomaly = -np.asarray(scores, dtype=np.float32)
+        if len(self.recent_scores) < keep:
+            self.recent_scores = np.concatenate([self.recent_scores, anomaly])[-keep:]
+            return
+        idx = (self._score_pos + np.arange(len(anomaly))) % keep
+        self.recent_scores[idx[-keep:]] = anomaly[-keep:]
+        self._score_pos = int(idx[-1] + 1) % keep
+
+    @property
+    def ready(self):
+        return self.windows > 0
+
+    def score_samples(self, X):
+        """
+        Anomaly scores, higher = more anomalous (same convention as IsolationAnomaly).
+        0 for every sample until the first window has been learned.
+        """
+        X = np.asarray(X)
+        if self.split_dim is None and Path(self.model_file).exists():
+            self.load()
+        if not self.ready:
+            return np.zeros(len(X), dtype=np.float64)
+        return -self._score(self._transform(X).reshape(len(X), -1))
+
+    def predict(self, X, threshold=None):
+        """
+        Boolean anomaly flags (True == anomaly). Without a threshold, samples scoring
+        above the (1 - contamination) quantile of recently learned samples are flagged.
+        """
+        scores = self.score_samples(X)
+        if not self.ready:
+            return np.zeros(len(scores), dtype=bool)
+        if threshold is None:
+            if not len(self.recent_scores):
+                return np.zeros(len(scores), dtype=bool)
+            threshold = float(np.quantile(self.recent_scores, 1.0 - self.contamination))
+        return scores > threshold
+
+    STATE = ("split_dim", "split_val", "ref", "latest", "recent_scores")
+
+    def _total(self):
+        return self.windows * self.window_size + self.seen
+
+    def _merge(self, disk):
+        """Combine with a file another process saved since our last sync; self becomes the merged model."""
+        mine_added, mine_n, mine_total, mine_scores = self.added, self.added_n, self._total(), self.recent_scores
+        same_trees = (disk["split_dim"].shape == self.split_dim.shape
+                      and np.array_equal(disk["split_dim"], self.split_dim)
+                      and np.array_equal(disk["split_val"], self.split_val))
+        if not same_trees:
+            # trees built independently from different first windows can't share masses: keep the more trained one
+            if int(disk["meta"][4]) * int(disk["meta"][2]) + int(disk["meta"][3]) >= mine_total:
+                self._set_state(disk)
+            return
+        self._set_state(disk)
+        self.recent_scores = np.concatenate([self.recent_scores, mine_scores])[-1024:]
+        self._score_pos = 0
+        self.latest = self.latest + mine_added
+        self.seen += mine_n
+        # complete windows the other way round from learn(): swap in proportional slices of the combined mass
+        while self.seen >= self.window_size:
+            self.ref = self.latest * (self.window_size / self.seen)
+            self.latest = self.latest - self.ref
+            self.seen -= self.window_size
+            self.windows += 1
+
+    def save(self, path=None):
+        """Write the model under a lock, merging with learning saved by other processes meanwhile."""
+        if self.split_dim is None:
+            return   # still warming up, nothing worth keeping
+        p = Path(path) if path is not None else Path(self.model_file)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(str(p) + ".lock"):
+            if p.exists():
+                disk = _load_npz(p)
+                if int(disk.get("version", 0)) != self.version:
+                    self._merge(disk)
+            self.version += 1
+            meta = np.array([self.n_trees, self.depth, self.window_size, self.seen, self.windows, self._score_pos])
+            tmp = p.with_name(f"{p.stem}.{os.getpid()}.tmp.npz")
+            np.savez_compressed(tmp, meta=meta, contamination=self.contamination, version=self.version,
+                                **{k: getattr(self, k) for k in self.STATE})
+            tmp.replace(p)
+        self.added = np.zeros_like(self.latest)
+        self.added_n = 0
+
+    def _set_state(self, d):
+        self.n_trees, self.depth, self.window_size, self.seen, self.windows, self._score_pos = (int(v) for v in d["meta"])
+        self.contamination = float(d["contamination"])
+        self.version = int(d.get("version", 0))
+        for k in self.STATE:
+            setattr(self, k, d[k])
+        self.size_limit = 0.1 * self.window_size
+        self.added = np.zeros_like(self.latest)
+        self.added_n = 0
+
+    def load(self):
+        if not Path(self.model_file).exists():
+            raise FileNotFoundError(f"Model not found at {self.model_file}")
+        self._set_state(_load_npz(self.model_file))
+
+def _load_npz(path):
+    with np.load(str(path)) as f:
+        return {k: f[k] for k in f.files}
+
+class TrajectoryScorer:
+    """
+    Pipeline stage around HalfSpaceTrees: keeps a TrackBuffer of the tracked
+    objects, and every `every_n_frames` scores the trajectory_features of each
+    track with enough history, learns from them, and (with alert: true) raises
+    TRAJECTORY_ANOMALY alerts for flagged tracks. The per-camera model file is
+    saved every `save_every_sec` (None: only by save(), with each checkpoint) and
+    at the end, so it keeps learning across runs.
+
+    Camera config:
+        trajectory_model:
+          enabled: true
+          alert: false          # learn only until the model has seen enough footage
+          every_n_frames: 5
+          min_history: 30       # frames of history before a track is scored (len is itself a feature)
+          n_trees: 25
+          depth: 10
+          window_size: 250
+          contamination: 0.01
+    """
+    def __init__(self, camera, fps, alert=False, every_n_frames=5, min_history=30, history_frames=30,
+                 save_every_sec=60, model_file=None, **model_opts):
+        from src.features import TrackBuffer
+        self.fps = fps
+        self.alert = bool(alert)
+        self.every = max(1, int(every_n_frames))
+        self.min_history = int(min_history)
+        self.buffer = TrackBuffer(max_frames=int(history_frames))
+        self.model = HalfSpaceTrees(model_file=model_file, camera=camera, **model_opts)
+        if Path(self.model.model_file).exists():
+            self.model.load()
+        self.save_every_sec = float(save_every_sec)
+        self.last_save = None
+        self.last_alert_time = {}
+
+    @classmethod
+    def from_config(cls, camera_cfg, fps):
+        """None unless the camera config has `trajectory_model: {enabled: true, ...}`."""
+        cfg = dict(camera_cfg.get("trajectory_model") or {})
+        if not cfg.pop("enabled", False):
+            return None
+        return cls(camera_cfg.get("camera", "default"), fps, **cfg)
+
+    def update(self, tracked, frame_id, video_time_sec, learn=True):
+        """
+        Buffer the tracks, then score and learn every `every_n_frames` frames.
+        learn=False only buffers (frames replayed on --resume or in a chunk's warm-up,
+        which were or will be learned by another run).
+        """
+        from src.features import trajectory_features
+        for t in tracked:
+            self.buffer.update(t["id"], t["xyxy"], frame_id)
+        if not learn or frame_id % self.every:
+            return []
+        self.buffer.prune(frame_id, max_inactive_frames=int(self.fps * 5))
+        self.last_alert_time = {k: v for k, v in self.last_alert_time.items() if k in self.buffer.hist}
+        rows = [t for t in tracked if len(self.buffer.get_history(t["id"])) >= self.min_history]
+        if not rows:
+            return []
+        X = np.vstack([trajectory_features(self.buffer.get_history(t["id"]), fps=self.fps) for t in rows])
+        # score before learning, so a track is judged against what came before it
+        scores = self.model.score_samples(X)
+        flags = self.model.predict(X) if self.alert else np.zeros(len(rows), dtype=bool)
+        self.model.learn(X)
+
+        if self.last_save is None:
+            self.last_save = video_time_sec
+        elif self.save_every_sec is not None and video_time_sec - self.last_save >= self.save_every_sec:
+            self.save()
+            self.last_save = video_time_sec
+
+        alerts = []
+        for t, score, flag in zip(rows, scores, flags):
+            tid = t["id"]
+            if not flag or video_time_sec - self.last_alert_time.get(tid, -1e9) <= 5:
+                continue
+            self.last_alert_time[tid] = video_time_sec
+            alerts.append({
+                "type": "TRAJECTORY_ANOMALY",
+                "label": t["label"],
+                "id": tid,
+                "score": float(score),
+                "frame": int(frame_id),
+                "video_time_sec": float(video_time_sec),
+                "xyxy": list(map(int, t["xyxy"])),
+                "extra": f"model={Path(self.model.model_file).name}",
+            })
+        return alerts
+
+    def save(self):
+        self.model.save()
@@ -0,0 +1,297 @@
+# src/batch.py
+"""
+Sharded batch processing over a job table in a SQLite file on a shared filesystem.
+
+    # 1. plan: one job per video, long videos split into time-range chunks
+    python -m src.batch --db /mnt/shared/batch/jobs.db --plan /mnt/archive/cam1 /mnt/archive/cam2 --chunk-sec 600
+    # 2. work: start any number of these, on any host that sees the shared directory
+    python -m src.batch --db /mnt/shared/batch/jobs.db --model yolov8m.onnx --tracker iou --exit-when-empty
+    # 3. merge finished shards into outputs/alerts/log.csv + outputs/snaps/ (safe to rerun)
+    python -m src.batch --db /mnt/shared/batch/jobs.db --merge
+    python -m src.batch --db /mnt/shared/batch/jobs.db --status
+
+Chunks overlap by --overlap-sec: a chunk runs the rules from that much earlier so
+loitering/abandonment timers are warmed up, but only logs alerts inside its own
+range. Workers hold a lease on their job that a heartbeat thread renews; if a
+worker dies, the lease runs out and another worker picks the job up. Each attempt
+writes its alerts and snapshots to its own shard directory next to the database,
+so a reclaimed job never mixes output with the attempt it replaces.
+"""
+import argparse
+import csv
+import glob
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import cv2
+
+from src.detect_anomalies import build_parser, get_tracker_cfg, load_model, process_video
+from src.utils import logger
+from src.utils.config import load_camera_config
+
+VIDEO_EXTS = (".avi", ".mp4", ".mov", ".mkv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY,
+    video         TEXT NOT NULL,
+    folder        TEXT NOT NULL,          -- source_folder written with the alerts
+    camera_config TEXT,                   -- overrides the worker's --camera-config
+    warmup_frame  INTEGER NOT NULL,       -- rules run from warmup_frame+1 ...
+    start_frame   INTEGER NOT NULL,       -- ... alerts are logged for start_frame+1 ..
+    end_frame     INTEGER,                -- .. end_frame (NULL = end of video)
+    status        TEXT NOT NULL DEFAULT 'pending',   -- pending | running | done | failed
+    worker        TEXT,
+    lease_until   REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    shard         TEXT,
+    merged        INTEGER NOT NULL DEFAULT 0,
+    error         TEXT,
+    updated_at    REAL,
+    UNIQUE (video, start_frame)
+)
+"""
+
+def connect(db):
+    # rollback journal rather than WAL: WAL needs shared memory, which network filesystems don't give
+    conn = sqlite3.connect(db, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute(SCHEMA)
+    return conn
+
+def find_videos(paths):
+    """(video_path, source_folder) pairs; source_folder matches what detect_anomalies logs for the same input."""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for v in sorted(glob.glob(os.path.join(p, "*"))):
+                if v.lower().endswith(VIDEO_EXTS):
+                    out.append((os.path.abspath(v), os.path.basename(os.path.normpath(p))))
+        elif os.path.isfile(p):
+            out.append((os.path.abspath(p), "single_video"))
+        else:
+            raise FileNotFoundError(p)
+    return out
+
+def chunk_ranges(n_frames, fps, chunk_sec, overlap_sec):
+    """[(warmup, start, end)] frame ranges covering a video; the last chunk runs to the end (end=None)."""
+    size = int(round(chunk_sec * fps)) if chunk_sec > 0 else 0
+    if size <= 0 or n_frames <= size:
+        return [(0, 0, None)]
+    overlap = int(round(overlap_sec * fps))
+    ranges = []
+    for start in range(0, n_frames, size):
+        end = start + size if start + size < n_frames else None
+        ranges.append((max(0, start - overlap), start, end))
+    return ranges
+
+def plan(conn, paths, chunk_sec=0.0, overlap_sec=30.0, camera_config=None):
+    n = 0
+    for video, folder in find_videos(paths):
+        cap = cv2.VideoCapture(video)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        for warmup, start, end in chunk_ranges(n_frames, fps, chunk_sec, overlap_sec):
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO jobs (video, folder, camera_config, warmup_frame, start_frame, end_frame, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", (video, folder, camera_config, warmup, start, end, time.time()))
+            n += cur.rowcount
+    return n
+
+def claim(conn, worker, lease_sec, max_attempts=3):
+    """Take the oldest pending job, or a running one whose lease ran out; None if there is none."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # jobs whose workers keep dying stop being retried
+        conn.execute("UPDATE jobs SET status = 'failed', error = 'lease expired ' || attempts || ' times'"
+                     " WHERE status = 'running' AND lease_until < ? AND attempts >= ?", (now, max_attempts))
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'pending' OR (status = 'running' AND lease_until < ?)"
+                           " ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                         " updated_at = ? WHERE id = ?", (worker, now + lease_sec, now, row["id"]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    job = dict(row)
+    job["attempts"] += 1
+    return job
+
+def release(conn, job, worker):
+    """Hand an interrupted job back to the queue; the attempt doesn't count towards max_attempts."""
+    conn.execute("UPDATE jobs SET status = 'pending', worker = NULL, lease_until = NULL, attempts = attempts - 1,"
+                 " updated_at = ? WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'",
+                 (time.time(), job["id"], worker, job["attempts"]))
+
+def finish(conn, job, worker, status, shard=None, error=None):
+    """Record the result unless the lease was lost to another worker meanwhile; returns whether it was recorded."""
+    cur = conn.execute("UPDATE jobs SET status = ?, shard = ?, error = ?, lease_until = NULL, updated_at = ?"
+                       " WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'",
+                       (status, shard, error, time.time(), job["id"], worker, job["attempts"]))
+    return cur.rowcount == 1
+
+class Lease(threading.Thread):
+    """Renews a job's lease every lease_sec/3 seconds while the job runs."""
+    def __init__(self, db, job, worker, lease_sec):
+        super().__init__(daemon=True)
+        self.db, self.job, self.worker, self.lease_sec = db, job, worker, lease_sec
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = connect(self.db)
+        while not self.stopped.wait(self.lease_sec / 3.0):
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND attempts = ?",
+                         (time.time() + self.lease_sec, self.job["id"], self.worker, self.job["attempts"]))
+        conn.close()
+
+    def stop(self):
+        self.stopped.set()
+        if self.ident is not None:
+            self.join()
+
+def run_chunk(model, job, shard, base_args):
+    args = argparse.Namespace(**vars(base_args))
+    # a reclaimed job starts over in a fresh shard; per-chunk checkpoints would resume into the old one
+    args.resume, args.checkpoint_sec = False, 0
+    if job["camera_config"]:
+        args.camera_config = job["camera_config"]
+    args.camera_cfg = load_camera_config(args.camera_config)
+    process_video(model, get_tracker_cfg(args.tracker), job["video"], job["folder"], args,
+                  frame_range=(job["warmup_frame"], job["start_frame"], job["end_frame"]),
+                  log_path=os.path.join(shard, "alerts", "log.csv"), snap_dir=os.path.join(shard, "snaps"))
+
+def work(db, base_args, lease_sec=300.0, poll_sec=5.0, exit_when_empty=False):
+    conn = connect(db)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    shard_root = os.path.join(os.path.dirname(os.path.abspath(db)), "shards")
+    model = load_model(base_args)
+    n = 0
+    while True:
+        job = claim(conn, worker, lease_sec)
+        if job is None:
+            left = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+            if exit_when_empty and left == 0:
+                break
+            time.sleep(poll_sec)
+            continue
+        shard = os.path.join(shard_root, f"job{job['id']:05d}_a{job['attempts']}")
+        end = job["end_frame"] if job["end_frame"] is not None else "end"
+        print(f"[{worker}] job {job['id']}: {job['video']} frames {job['start_frame'] + 1}..{end}")
+        lease = Lease(db, job, worker, lease_sec)
+        t0 = time.perf_counter()
+        error = None
+        finished = False
+        try:
+            lease.start()
+            run_chunk(model, job, shard, base_args)
+            finished = True
+        except Exception:
+            error = traceback.format_exc()
+            finished = True
+        finally:
+            lease.stop()
+            if not finished:
+                # KeyboardInterrupt/SystemExit: give the job back right away instead of waiting out the lease
+                release(conn, job, worker)
+        if error is not None:
+            status = "failed" if job["attempts"] >= 3 else "pending"
+            finish(conn, job, worker, status, error=error)
+            print(f"  failed after {time.perf_counter() - t0:.1f}s ({status})")
+        else:
+            if finish(conn, job, worker, "done", shard=shard):
+                print(f"  done in {time.perf_counter() - t0:.1f}s")
+            else:
+                print("  lease was lost to another worker, result discarded")
+        n += 1
+    print(f"[{worker}] no jobs left, processed {n}")
+
+def merge(conn, log_path=None, snap_dir=None):
+    """
+    Append finished, not yet merged shards to the main alert log; snapshots are moved into the main snap dir.
+    Rows already in the log are skipped, so a merge interrupted between appending a shard and marking it
+    merged can simply be rerun.
+    """
+    log_path = log_path or logger.LOG_PATH
+    snap_dir = snap_dir or logger.SNAP_DIR
+    jobs = conn.execute("SELECT * FROM jobs WHERE status = 'done' AND merged = 0 ORDER BY video, start_frame").fetchall()
+    seen = set()
+    if jobs and os.path.exists(log_path):
+        with open(log_path, "r", newline="", encoding="utf-8") as f:
+            seen = {tuple(r[c] for c in logger.LOG_COLUMNS) for r in csv.DictReader(f)}
+    total = 0
+    for job in jobs:
+        shard_log = os.path.join(job["shard"], "alerts", "log.csv")
+        rows = []
+        if os.path.exists(shard_log):
+            with open(shard_log, "r", newline="", encoding="utf-8") as f:
+                rows = [r for r in csv.DictReader(f)]
+        moved = {}
+        shard_snaps = os.path.join(job["shard"], "snaps")
+        for r in rows:
+            for old in [r["snap_path"]] + [x[5:] for x in r["extra"].split() if x.startswith("crop=")]:
+                if old and old not in moved:
+                    # keep the <date>/<camera>/ layout under the main snap dir
+                    new = os.path.join(snap_dir, os.path.relpath(old, shard_snaps))
+                    if os.path.exists(old):
+                        os.makedirs(os.path.dirname(new), exist_ok=True)
+                        shutil.move(old, new)
+                    moved[old] = new
+            r["snap_path"] = moved.get(r["snap_path"], r["snap_path"])
+            r["extra"] = " ".join("crop=" + moved.get(x[5:], x[5:]) if x.startswith("crop=") else x
+                                  for x in r["extra"].split())
+        rows.sort(key=lambda r: int(r["frame"] or 0))
+        new_rows = [row for row in (tuple(r[c] for c in logger.LOG_COLUMNS) for r in rows) if row not in seen]
+        logger.append_rows(new_rows, log_path)
+        seen.update(new_rows)
+        conn.execute("UPDATE jobs SET merged = 1 WHERE id = ?", (job["id"],))
+        total += len(new_rows)
+    print(f"Merged {len(jobs)} shards, {total} alerts into {log_path}")
+
+def status(conn):
+    for row in conn.execute("SELECT status, COUNT(*) AS n, SUM(merged) AS merged FROM jobs GROUP BY status"):
+        print(f"{row['status']:8s} {row['n']:6d}" + (f"  ({row['merged']} merged)" if row["status"] == "done" else ""))
+    for row in conn.execute("SELECT id, video, start_frame, worker, lease_until FROM jobs WHERE status = 'running'"):
+        print(f"  running job {row['id']} ({os.path.basename(row['video'])} @{row['start_frame']}) on {row['worker']}, "
+              f"lease {row['lease_until'] - time.time():+.0f}s")
+    for row in conn.execute("SELECT id, video, error FROM jobs WHERE status = 'failed'"):
+        print(f"  failed job {row['id']} ({row['video']}): {(row['error'] or '').strip().splitlines()[-1:]}")
+
+def main():
+    ap = build_parser()
+    ap.description = __doc__
+    ap.formatter_class = argparse.RawDescriptionHelpFormatter
+    ap.add_argument("--db", default=os.path.join("outputs", "batch", "jobs.db"), help="Job table (SQLite file on shared storage)")
+    ap.add_argument("--plan", nargs="+", metavar="PATH", help="Add jobs for these videos / folders of videos and exit")
+    ap.add_argument("--chunk-sec", type=float, default=0.0, help="Split videos longer than this into chunks (0 = whole videos)")
+    ap.add_argument("--overlap-sec", type=float, default=30.0, help="Rule warm-up before each chunk")
+    ap.add_argument("--merge", action="store_true", help="Merge finished shards into the main alert log and exit")
+    ap.add_argument("--status", action="store_true", help="Print job counts and exit")
+    ap.add_argument("--lease-sec", type=float, default=300.0)
+    ap.add_argument("--poll", type=float, default=5.0, help="Seconds between checks when no job is claimable")
+    ap.add_argument("--exit-when-empty", action="store_true", help="Stop once no job is pending or running")
+    args = ap.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    conn = connect(args.db)
+    if args.plan:
+        camera_config = os.path.abspath(args.camera_config) if args.camera_config else None
+        print(f"Planned {plan(conn, args.plan, args.chunk_sec, args.overlap_sec, camera_config)} new jobs")
+    elif args.merge:
+        merge(conn)
+    elif args.status:
+        status(conn)
+    else:
+        conn.close()
+        work(args.db, args, args.lease_sec, args.poll, args.exit_when_empty)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src/bench_trackers.py
+"""
+Compare tracker backends on identical detections.
+
+Detections are produced once (from a video with the configured detector, or a
+synthetic random-walk scene) and replayed through every tracker, so the timings
+only measure tracker.update().
+
+    python -m src.bench_trackers --video data/av2.avi --trackers strongsort iou
+    python -m src.bench_trackers --synthetic 40 --frames 2000
+"""
+import argparse
+import time
+import numpy as np
+
+from src.tracking.base import build_tracker
+
+def record_detections(video_path, model_path, conf, max_frames):
+    import cv2
+    from src.detectors.base import build_detector
+    from src.detectors.tiling import TiledDetector
+
+    model = build_detector("onnx" if model_path.endswith(".onnx") else "ultralytics", model_path)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    detector = TiledDetector(model, {}, size, conf=conf)
+    dets = []
+    while len(dets) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        dets.append(detector.detect(frame))
+    cap.release()
+    return dets, fps, size
+
+def synthetic_detections(n_objects, n_frames, size=(1920, 1080), seed=0):
+    """Boxes doing random walks, with missed detections and score noise."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    pos = rng.uniform([0, 0], [w - 80, h - 160], size=(n_objects, 2))
+    wh = rng.uniform([30, 60], [80, 160], size=(n_objects, 2))
+    vel = rng.normal(0, 3, size=(n_objects, 2))
+    cls = rng.choice([0, 24, 26], size=n_objects)
+    dets = []
+    for _ in range(n_frames):
+        vel = 0.9 * vel + rng.normal(0, 1, size=vel.shape)
+        pos = np.clip(pos + vel, 0, [w - 80, h - 160])
+        seen = rng.random(n_objects) > 0.05
+        xyxy = np.concatenate([pos, pos + wh], axis=1)[seen].astype(np.float32)
+        conf = rng.uniform(0.3, 0.95, size=seen.sum()).astype(np.float32)
+        dets.append((xyxy, conf, cls[seen]))
+    return dets, 30.0, size
+
+def bench(name, dets, fps, size):
+    tracker = build_tracker(name, fps)
+    frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    times, ids, per_frame = [], set(), []
+    for xyxy, conf, cls in dets:
+        t0 = time.perf_counter()
+        tracks = tracker.update(xyxy, conf, cls, frame)
+        times.append(time.perf_counter() - t0)
+        ids.update(tracks[:, 4].astype(int).tolist())
+        per_frame.append(len(tracks))
+    times = np.array(times) * 1000.0
+    return {
+        "tracker": name,
+        "ms_mean": times.mean(),
+        "ms_p95": np.percentile(times, 95),
+        "tracks_per_frame": float(np.mean(per_frame)),
+        "unique_ids": len(ids),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--video", help="Video to record detections from")
+    ap.add_argument("--model", default="yolov8m.pt")
+    ap.add_argument("--conf", type=float, default=0.3)
+    ap.add_argument("--frames", type=int, default=1000)
+    ap.add_argument("--synthetic", type=int, default=0, help="Use N synthetic objects instead of a video")
+    ap.add_argument("--trackers", nargs="+", default=["strongsort", "iou"])
+    args = ap.parse_args()
+
+    if args.video:
+        dets, fps, size = record_detections(args.video, args.model, args.conf, args.frames)
+    else:
+        dets, fps, size = synthetic_detections(args.synthetic or 20, args.frames)
+    n_dets = sum(len(d[0]) for d in dets)
+    print(f"{len(dets)} frames, {n_dets / max(1, len(dets)):.1f} detections/frame")
+
+    print(f"{'tracker':<12}{'ms/frame':>10}{'p95 ms':>10}{'tracks/frame':>14}{'unique ids':>12}")
+    for name in args.trackers:
+        r = bench(name, dets, fps, size)
+        print(f"{r['tracker']:<12}{r['ms_mean']:>10.3f}{r['ms_p95']:>10.3f}"
+              f"{r['tracks_per_frame']:>14.1f}{r['unique_ids']:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src/checkpoint.py
+import csv
+import hashlib
+import os
+import pickle
+import time
+from datetime import datetime
+
+from src.utils import logger
+
+CHECKPOINT_DIR = os.path.join("outputs", "checkpoints")
+
+def logged_alert_frame(source_video, source_folder, since=None, log_path=None):
+    """Highest frame with an alert already in the CSV log for this source (rows logged at/after `since`), 0 if none."""
+    log_path = log_path or logger.LOG_PATH
+    if not os.path.exists(log_path):
+        return 0
+    top = 0
+    with open(log_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("source_video") != source_video or row.get("source_folder") != source_folder:
+                continue
+            if since and row.get("timestamp", "") < since:
+                continue
+            try:
+                top = max(top, int(row.get("frame") or 0))
+            except ValueError:
+                pass
+    return top
+
+class Checkpointer:
+    """
+    Periodic checkpoints of one source: last processed frame, RuleEngine state and
+    tracker state, pickled to outputs/checkpoints/<out_name>_<hash of source path>.ckpt. Each write goes
+    to a temp file that is fsynced and renamed over the old one, so a crash leaves
+    either the previous or the new checkpoint, never a partial one.
+    """
+    def __init__(self, out_name, every_sec=60.0, ckpt_dir=CHECKPOINT_DIR, source=None):
+        if source is not None:
+            # same-named videos in different folders must not share a checkpoint
+            out_name += "_" + hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:10]
+        self.path = os.path.join(ckpt_dir, f"{out_name}.ckpt")
+        self.every_sec = float(every_sec)
+        self.last_save = time.monotonic()
+        self.run_started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.alert_frame = 0   # last frame this run logged an alert on
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        # alerts logged before the crash belong to the same run
+        self.run_started = state["run_started"]
+        self.alert_frame = state["alert_frame"]
+        return state
+
+    def due(self):
+        return time.monotonic() - self.last_save >= self.every_sec
+
+    def save(self, frame_id, video_time_sec, engine, tracker, meta, finished=False):
+        state = {
+            "frame_id": frame_id,
+            "video_time_sec": video_time_sec,
+            "finished": finished,
+            "run_started": self.run_started,
+            "alert_frame": self.alert_frame,
+            "meta": meta,
+            "engine": engine.state_dict(),
+            "tracker": tracker.state_dict(),
+            "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.last_save = time.monotonic()
+
+def restore(state, engine, tracker, meta, fps):
+    """
+    Load checkpointed state into a fresh engine/tracker; returns the number of
+    frames to skip. If the tracker can't be restored or the rules/tracker config
+    changed, nothing is loaded and processing restarts early enough to re-seed:
+    the longest rule window before the checkpoint, on fresh state.
+    """
+    if state["meta"] == meta and state["tracker"] is not None:
+        try:
+            engine.load_state_dict(state["engine"])   # validates before changing anything
+        except ValueError as e:
+            print(f"Checkpoint: {e}, re-seeding")
+        else:
+            tracker.load_state_dict(state["tracker"])
+            return state["frame_id"]
+    warmup = int(max(engine.windows, default=0) * fps) + 1
+    return max(0, state["frame_id"] - warmup)
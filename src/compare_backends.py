@@ -0,0 +1,83 @@
+# src/compare_backends.py
+"""
+Check an exported ONNX model against the ultralytics .pt path on the same frames.
+
+    yolo export model=yolov8m.pt format=onnx imgsz=960
+    python -m src.compare_backends --pt yolov8m.pt --onnx yolov8m.onnx --videos data/av2.avi data/av3.avi
+
+For every frame both backends run through the same TiledDetector; detections are
+matched greedily by IoU within the same class. Reports agreement and latency.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+
+from src.detectors.base import build_detector
+from src.detectors.tiling import TiledDetector
+from src.tracking.iou_tracker import iou_matrix
+
+def match(a, b, a_cls, b_cls, thr):
+    """Greedy same-class IoU matching; returns list of (i, j, iou)."""
+    if len(a) == 0 or len(b) == 0:
+        return []
+    iou = iou_matrix(a, b) * (a_cls[:, None] == b_cls[None, :])
+    pairs = []
+    while True:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        if iou[i, j] < thr:
+            return pairs
+        pairs.append((i, j, float(iou[i, j])))
+        iou[i, :] = 0
+        iou[:, j] = 0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pt", default="yolov8m.pt")
+    ap.add_argument("--onnx", required=True)
+    ap.add_argument("--videos", nargs="+", default=["data/av2.avi", "data/av3.avi"])
+    ap.add_argument("--frames", type=int, default=200, help="Frames per video")
+    ap.add_argument("--imgsz", type=int, default=960)
+    ap.add_argument("--conf", type=float, default=0.3)
+    ap.add_argument("--threads", type=int, default=0)
+    ap.add_argument("--int8", action="store_true")
+    ap.add_argument("--match-iou", type=float, default=0.5)
+    args = ap.parse_args()
+
+    ref = build_detector("ultralytics", args.pt)
+    onnx = build_detector("onnx", args.onnx, intra_threads=args.threads, int8=args.int8)
+    det_cfg = {"mode": "full", "imgsz": args.imgsz}
+
+    for video in args.videos:
+        cap = cv2.VideoCapture(video)
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        runs = [TiledDetector(d, det_cfg, size, conf=args.conf) for d in (ref, onnx)]
+        n_ref = n_onnx = n_match = 0
+        ious, conf_diff, times = [], [], [[], []]
+        for _ in range(args.frames):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            out = []
+            for k, run in enumerate(runs):
+                t0 = time.perf_counter()
+                out.append(run.detect(frame))
+                times[k].append(time.perf_counter() - t0)
+            (ra, rc, rk), (oa, oc, ok_) = out
+            pairs = match(ra, oa, rk, ok_, args.match_iou)
+            n_ref += len(ra)
+            n_onnx += len(oa)
+            n_match += len(pairs)
+            ious += [p[2] for p in pairs]
+            conf_diff += [abs(float(rc[i]) - float(oc[j])) for i, j, _ in pairs]
+        cap.release()
+
+        print(f"{video}: {len(times[0])} frames")
+        print(f"  detections   ultralytics={n_ref}  onnx={n_onnx}  matched={n_match}")
+        print(f"  recall vs pt {n_match / max(1, n_ref):.3f}   precision vs pt {n_match / max(1, n_onnx):.3f}")
+        if ious:
+            print(f"  matched IoU  mean={np.mean(ious):.3f} min={np.min(ious):.3f}   |conf diff| mean={np.mean(conf_diff):.4f}")
+        print(f"  ms/frame     ultralytics={1000 * np.mean(times[0]):.1f}  onnx={1000 * np.mean(times[1]):.1f}")
+
+if __name__ == "__main__":
+    main()
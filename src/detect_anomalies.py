@@ -1,10 +1,18 @@
-import os, cv2, time, argparse, glob, numpy as np
-from ultralytics import YOLO
-
-from src.rules.loitering import LoiteringRule
-from src.rules.abandonment import AbandonmentRule
-from src.utils.draw import draw_tracks, label_for
-from src.utils.logger import log_alert
+import os, cv2, time, argparse, glob, itertools
+
+from src.anomaly_model import TrajectoryScorer
+from src.checkpoint import Checkpointer, logged_alert_frame, restore
+from src.detectors.base import build_detector
+from src.detectors.tiling import TiledDetector
+from src.heatmaps import HeatmapAccumulator
+from src.output import VideoOutput, annotate
+from src.rules.engine import RuleEngine
+from src.sources import LatestFrameReader, LiveStats, iter_live_frames
+from src.tracking.base import build_tracker, tracker_cfg_path
+from src.utils.config import load_camera_config
+from src.utils.draw import label_for
+from src.utils import logger
+from src.utils.snapshots import SnapshotWriter
 
 # Define tracked object categories
 WANTED_LABELS = {
@@ -13,10 +21,9 @@ WANTED_LABELS = {
     "bag": {"ids": [24, 26, 28]},           # backpack(24), handbag(26), suitcase(28)
 }
 
-def get_tracker_cfg():
-    here = os.path.dirname(os.path.abspath(__file__))
-    cfg = os.path.abspath(os.path.join(here, "..", "trackers", "strongsort.yaml"))
-    return cfg if os.path.exists(cfg) else "strongsort.yaml"
+def get_tracker_cfg(name="strongsort"):
+    """YAML for a tracker name from trackers/ (strongsort, iou) or an explicit path."""
+    return tracker_cfg_path(name)
 
 def map_label(cls_id: int, names):
     """Map YOLO class id to our tracked categories."""
@@ -43,72 +50,178 @@ def iter_tif_sequence(seq_dir):
                 img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
             yield img
 
-def process_video(model, tracker_cfg, video_path, parent_folder, args):
-    """Process a single .avi/.mp4/.mov video."""
+def iter_video_frames(cap, fps, start_frame=0):
+    """
+    Yield (frame_id, video_time_sec, frame) from an opened cv2.VideoCapture until it runs out,
+    skipping the first `start_frame` frames (seek, or grab() through them if the container can't seek).
+    """
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            for _ in range(start_frame):
+                if not cap.grab():
+                    break
+    frame_id = start_frame
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frame_id += 1
+        yield frame_id, frame_id / fps, frame
+
+def tracks_to_tracked(tracks, names):
+    """Convert tracker output rows [x1, y1, x2, y2, id, score, cls, idx] into our list of tracked dicts."""
+    tracked = []
+    for row in tracks:
+        lbl = map_label(int(row[6]), names)
+        if lbl is None:
+            continue
+        x1, y1, x2, y2 = row[:4].tolist()
+        tracked.append({"id": int(row[4]), "xyxy": [x1, y1, x2, y2], "label": lbl})
+    return tracked
+
+def run_frames(model, tracker_cfg, frames, fps, frame_size, source_video, source_folder, out_name, args,
+               seek=None, log_from_frame=0, source_path=None, log_path=None, snap_dir=None, behind=None):
+    """
+    Detect -> track -> rules -> alerts over one sequence of (frame_id, video_time_sec, frame).
+    Rules measure time with video_time_sec, so frames may be skipped (live mode).
+    Seekable sources pass seek(start_frame) -> frames and their source_path; they are checkpointed and can be resumed.
+    Alerts before log_from_frame are not logged (rule warm-up of a chunk).
+    log_path/snap_dir redirect the alert log and snapshots (default outputs/alerts/log.csv, outputs/snaps).
+    behind() (live mode) is True while processing is over its latency budget; video output and
+    display are skipped for those frames so detection, rules and alerts catch up.
+    """
+    log_path = log_path or logger.LOG_PATH
+    width, height = frame_size
+    names = model.names
+
+    detector = TiledDetector(model, args.camera_cfg.get("detection") or {}, frame_size, conf=args.conf)
+    if len(detector.crops) > 1 or detector.pixels_per_frame != width * height:
+        print(f"Detection: {len(detector.crops)} crops, {detector.pixels_per_frame / 1e6:.2f} MPx/frame "
+              f"(full frame {width * height / 1e6:.2f} MPx)")
+    tracker = build_tracker(tracker_cfg, fps)
+    engine = RuleEngine.from_config(args.camera_cfg, fps, frame_size)
+    snapshots = SnapshotWriter.from_config(snap_dir or logger.SNAP_DIR, args.camera_cfg.get("snapshots"),
+                                           camera=args.camera_cfg.get("camera", "default"))
+    heatmaps = HeatmapAccumulator.from_config(args.camera_cfg, frame_size, min(engine.windows, default=None))
+    trajectories = TrajectoryScorer.from_config(args.camera_cfg, fps)
+
+    checkpointer = None
+    frame_id, video_time_sec = 0, 0.0
+    suppress_until = log_from_frame - 1   # alerts up to this frame are warm-up or were logged before a crash
+    learned_until = log_from_frame - 1    # frames up to this one are already in the model and heatmap files
+    if seek is not None and args.checkpoint_sec > 0:
+        checkpointer = Checkpointer(out_name, args.checkpoint_sec, source=source_path or out_name)
+        meta = {"camera_cfg": {k: args.camera_cfg.get(k) for k in ("zones", "rules", "engine")},
+                "tracker_cfg": tracker_cfg, "fps": fps}
+        state = checkpointer.load() if args.resume else None
+        if state is not None:
+            if state["finished"]:
+                print(f"Resume: {out_name} already finished, skipping")
+                return
+            start = restore(state, engine, tracker, meta, fps)
+            suppress_until = max(suppress_until, state["frame_id"], checkpointer.alert_frame,
+                                 logged_alert_frame(source_video, source_folder, since=checkpointer.run_started,
+                                                    log_path=log_path))
+            learned_until = max(learned_until, state["frame_id"])
+            print(f"Resume: {out_name} from frame {start} (checkpoint at {state['frame_id']}, "
+                  f"{'restored' if start == state['frame_id'] else 're-seeding'} state)")
+            frames = seek(start)
+            frame_id, video_time_sec = start, start / fps
+        # model and heatmap files are written with each checkpoint only, so they never hold frames a resume replays
+        for store in (heatmaps, trajectories):
+            if store:
+                store.save_every_sec = None
+
+    def persist():
+        if heatmaps:
+            heatmaps.flush()
+        if trajectories:
+            trajectories.save()
+
+    output = None
+    if args.save:
+        output = VideoOutput(out_name, fps, frame_size, args.camera_cfg.get("output"), engine.zone_map)
+    # live mode drops output frames rather than stall the pipeline when the encoder falls behind
+    block = args.live is None
+
+    finished = False
+    try:
+        for frame_id, video_time_sec, frame in frames:
+            xyxy, conf, cls = detector.detect(frame)
+            tracks = tracker.update(xyxy, conf, cls, frame)
+            tracked = tracks_to_tracked(tracks, names)
+            alerts = engine.update(tracked, frame_id, video_time_sec)
+            if trajectories:
+                alerts += trajectories.update(tracked, frame_id, video_time_sec, learn=frame_id > learned_until)
+            if heatmaps and frame_id > learned_until:
+                heatmaps.update(engine.ctx, video_time_sec, frame)
+            if frame_id <= suppress_until:
+                alerts = []
+            elif alerts and checkpointer:
+                checkpointer.alert_frame = frame_id
+
+            for a in alerts:
+                a["source_video"] = source_video
+                a["source_folder"] = source_folder
+            logger.log_alerts(alerts, frame, snapshots, log_path)
+
+            shed = behind is not None and behind()
+            if args.show and not shed:
+                cv2.imshow("Surveillance (YOLOv8 + StrongSORT)", annotate(frame, tracked, alerts, engine.zone_map))
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+
+            if output and (alerts or not shed):   # frames with alerts still go out, e.g. to open a clip
+                output.submit(frame_id, video_time_sec, frame, tracked, alerts, block=block)
+
+            if checkpointer and checkpointer.due():
+                checkpointer.save(frame_id, video_time_sec, engine, tracker, meta)
+                persist()
+        else:
+            if checkpointer:
+                checkpointer.save(frame_id, video_time_sec, engine, tracker, meta, finished=True)
+            finished = True
+    finally:
+        if output:
+            output.close()
+        # an interrupted checkpointed run is resumed from its last checkpoint, which already persisted up to there
+        if finished or checkpointer is None:
+            persist()
+    if snapshots.written or snapshots.deduped:
+        print(f"Snapshots: {snapshots.written} written, {snapshots.deduped} reused (near-duplicates)")
+    cv2.destroyAllWindows()
+
+def process_video(model, tracker_cfg, video_path, parent_folder, args, frame_range=None, log_path=None, snap_dir=None):
+    """
+    Process a single .avi/.mp4/.mov video.
+    frame_range=(warmup, start, end) processes only frames start+1..end (end=None: to the end),
+    running the rules from frame warmup+1 on so they are warmed up at the chunk start.
+    """
     cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    cap.release()
-
-    names = model.model.names if hasattr(model.model, "names") else {}
 
-    loiter_rule = LoiteringRule(fps=fps, window_sec=12, min_disp_px=40)
-    abandon_rule = AbandonmentRule(fps=fps, window_sec=6, bag_stationary_px=20,
-                                   unattended_sec=12, near_px=140)
-
-    writer = None
-    if args.save:
-        os.makedirs("outputs/videos", exist_ok=True)
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out_path = os.path.join("outputs", "videos",
-                                f"out_{parent_folder}_{os.path.basename(video_path).rsplit('.',1)[0]}_{int(time.time())}.mp4")
-        writer = cv2.VideoWriter(out_path, fourcc, fps, (width, height))
-        print("Saving to:", out_path)
-
-    frame_id = 0
-    for res in model.track(source=video_path, stream=True, conf=args.conf,
-                           tracker=tracker_cfg, persist=True, imgsz=960, iou=0.5):
-        frame = res.orig_img
-        frame_id += 1
-        video_time_sec = frame_id / fps
-
-        tracked = []
-        if getattr(res, "boxes", None) is not None and len(res.boxes) > 0:
-            xyxy = res.boxes.xyxy.cpu().numpy()
-            clss = res.boxes.cls.cpu().numpy().astype(int) if res.boxes.cls is not None else np.zeros(len(xyxy), dtype=int)
-            ids = res.boxes.id.cpu().numpy().astype(int) if getattr(res.boxes, "id", None) is not None else np.arange(len(xyxy))
-
-            for i in range(len(xyxy)):
-                lbl = map_label(int(clss[i]), names)
-                if lbl is None:
-                    continue
-                x1, y1, x2, y2 = xyxy[i].tolist()
-                tracked.append({"id": int(ids[i]), "xyxy": [x1, y1, x2, y2], "label": lbl})
-
-        alerts = []
-        if tracked:
-            alerts += loiter_rule.update(tracked, frame_id, video_time_sec)
-            alerts += abandon_rule.update(tracked, frame_id, video_time_sec)
-
-        draw_tracks(frame, tracked, alerts, names)
-
-        for a in alerts:
-            a["source_video"] = os.path.basename(video_path)
-            a["source_folder"] = parent_folder
-            log_alert(a, frame)
-
-        if writer:
-            writer.write(frame)
-
-        if args.show:
-            cv2.imshow("Surveillance (YOLOv8 + StrongSORT)", frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
-    if writer:
-        writer.release()
-    cv2.destroyAllWindows()
+    out_name = f"{parent_folder}_{os.path.basename(video_path).rsplit('.',1)[0]}"
+    first, log_from, last = 0, 0, None
+    if frame_range is not None:
+        first, start, last = frame_range
+        log_from = start + 1
+        out_name += f"_{start}"
+
+    def frames_from(start):
+        frames = iter_video_frames(cap, fps, start)
+        return frames if last is None else itertools.takewhile(lambda item: item[0] <= last, frames)
+
+    try:
+        run_frames(model, tracker_cfg, frames_from(first), fps, (width, height),
+                   os.path.basename(video_path), parent_folder, out_name, args,
+                   seek=frames_from, log_from_frame=log_from, source_path=video_path,
+                   log_path=log_path, snap_dir=snap_dir)
+    finally:
+        cap.release()
 
 def process_tif_folder(model, tracker_cfg, main_folder, args):
     """Process a folder with multiple TestXXX .tif sequences."""
@@ -121,79 +234,98 @@ def process_tif_folder(model, tracker_cfg, main_folder, args):
 
         fps = 30
         height, width = frames[0].shape[:2]
-        names = model.model.names if hasattr(model.model, "names") else {}
-
-        loiter_rule = LoiteringRule(fps=fps, window_sec=12, min_disp_px=40)
-        abandon_rule = AbandonmentRule(fps=fps, window_sec=6, bag_stationary_px=20,
-                                       unattended_sec=12, near_px=140)
-
-        writer = None
-        if args.save:
-            os.makedirs("outputs/videos", exist_ok=True)
-            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            out_path = os.path.join("outputs", "videos",
-                                    f"out_{os.path.basename(main_folder)}_{os.path.basename(seq)}_{int(time.time())}.mp4")
-            writer = cv2.VideoWriter(out_path, fourcc, fps, (width, height))
-            print("Saving to:", out_path)
-
-        for frame_id, frame in enumerate(frames, start=1):
-            results = model.track(frame, stream=False, conf=args.conf,
-                                  tracker=tracker_cfg, persist=True, imgsz=960, iou=0.5)
-            for res in results:
-                video_time_sec = frame_id / fps
-
-                tracked = []
-                if getattr(res, "boxes", None) is not None and len(res.boxes) > 0:
-                    xyxy = res.boxes.xyxy.cpu().numpy()
-                    clss = res.boxes.cls.cpu().numpy().astype(int) if res.boxes.cls is not None else np.zeros(len(xyxy), dtype=int)
-                    ids = res.boxes.id.cpu().numpy().astype(int) if getattr(res.boxes, "id", None) is not None else np.arange(len(xyxy))
-
-                    for i in range(len(xyxy)):
-                        lbl = map_label(int(clss[i]), names)
-                        if lbl is None:
-                            continue
-                        x1, y1, x2, y2 = xyxy[i].tolist()
-                        tracked.append({"id": int(ids[i]), "xyxy": [x1, y1, x2, y2], "label": lbl})
-
-                alerts = []
-                if tracked:
-                    alerts += loiter_rule.update(tracked, frame_id, video_time_sec)
-                    alerts += abandon_rule.update(tracked, frame_id, video_time_sec)
-
-                draw_tracks(frame, tracked, alerts, names)
-
-                for a in alerts:
-                    a["source_video"] = os.path.basename(seq)
-                    a["source_folder"] = os.path.basename(main_folder)
-                    log_alert(a, frame)
-
-                if writer:
-                    writer.write(frame)
-
-                if args.show:
-                    cv2.imshow("Surveillance (YOLOv8 + StrongSORT)", frame)
-                    if cv2.waitKey(1) & 0xFF == ord("q"):
-                        break
-
-        if writer:
-            writer.release()
-        cv2.destroyAllWindows()
-
-
-def main():
+        run_frames(model, tracker_cfg, ((i, i / fps, f) for i, f in enumerate(frames, start=1)),
+                   fps, (width, height),
+                   os.path.basename(seq), os.path.basename(main_folder),
+                   f"{os.path.basename(main_folder)}_{os.path.basename(seq)}", args,
+                   seek=lambda start, frames=frames, fps=fps: ((i, i / fps, f) for i, f in enumerate(frames, start=1) if i > start),
+                   source_path=seq)
+
+
+def source_name(source):
+    """Readable name for a live source: device_0, a stream's last path part, or a file name."""
+    source = str(source)
+    if source.isdigit():
+        return f"device_{source}"
+    return os.path.basename(source.rstrip("/")) or source
+
+def process_live(model, tracker_cfg, source, args):
+    """Process a camera/stream (or a file replayed at native fps) in real time, newest frame first."""
+    reader = LatestFrameReader(source)
+    stats = LiveStats()
+    frames = iter_live_frames(reader, args.latency_budget_ms / 1000.0, stats)
+    name = source_name(source)
+    print(f"Live: {name} @ {reader.fps:.1f} fps, latency budget {args.latency_budget_ms:.0f}ms")
+    try:
+        run_frames(model, tracker_cfg, frames, reader.fps, reader.frame_size, name, "live", f"live_{name}", args,
+                   behind=lambda: stats.behind)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frames.close()
+
+def build_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("--video", help="Single video file (.avi, .mp4, .mov)")
     ap.add_argument("--folder", help="Folder with .avi videos or TestXXX .tif folders")
-    ap.add_argument("--model", default="yolov8m.pt")
+    ap.add_argument("--live", help="Live source: device index (0), stream URL (rtsp://...), or a file replayed at native fps")
+    ap.add_argument("--latency-budget-ms", type=float, default=1000.0,
+                    help="Live mode: while frames take longer than this from capture to processed, "
+                         "skip video output and display to catch up")
+    ap.add_argument("--model", default="yolov8m.pt", help="Model file: .pt for ultralytics, exported .onnx for onnx")
+    ap.add_argument("--backend", choices=["ultralytics", "onnx"], default=None,
+                    help="Inference backend (default: onnx for .onnx models, else ultralytics)")
+    ap.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = auto)")
+    ap.add_argument("--inter-threads", type=int, default=0, help="ONNX Runtime inter-op threads (0 = auto)")
+    ap.add_argument("--int8", action="store_true", help="Dynamically quantize the ONNX model to int8 (cached next to it)")
+    ap.add_argument("--no-warmup", action="store_true", help="Skip the dummy inference run at model load")
     ap.add_argument("--conf", type=float, default=0.3)
     ap.add_argument("--show", action="store_true")
     ap.add_argument("--save", action="store_true")
-    args = ap.parse_args()
-
-    model = YOLO(args.model)
-    tracker_cfg = get_tracker_cfg()
-
-    if args.video:
+    ap.add_argument("--tracker", default=None,
+                    help="Tracker config from trackers/ (strongsort, iou) or a YAML path; 'iou' is CPU-only, no re-id "
+                         "(default: iou for the onnx backend so torch is never imported, else strongsort)")
+    ap.add_argument("--resume", action="store_true",
+                    help="Continue each video from its last checkpoint; alerts logged before the crash are not repeated")
+    ap.add_argument("--checkpoint-sec", type=float, default=60.0,
+                    help="Seconds of processing between checkpoints in outputs/checkpoints/ (0 = off)")
+    ap.add_argument("--camera-config", help="Per-camera YAML (rules, zones, detection ROIs); defaults to configs/cameras/default.yaml")
+    return ap
+
+def resolve_backend(args):
+    """Fill in --backend and --tracker defaults; ONNX Runtime options are rejected for the ultralytics backend."""
+    args.backend = args.backend or ("onnx" if args.model.endswith(".onnx") else "ultralytics")
+    if args.tracker is None:
+        # strongsort lives in ultralytics, which imports torch
+        args.tracker = "iou" if args.backend == "onnx" else "strongsort"
+    if args.backend != "onnx":
+        ignored = [flag for flag, value in (("--threads", args.threads), ("--inter-threads", args.inter_threads),
+                                            ("--int8", args.int8)) if value]
+        if ignored:
+            raise ValueError(f"{', '.join(ignored)}: ONNX Runtime options, not used by the '{args.backend}' backend")
+
+def load_model(args):
+    """Build the detector backend once and warm it up; reused for every video/job."""
+    t0 = time.perf_counter()
+    resolve_backend(args)
+    backend = args.backend
+    model = build_detector(backend, args.model, intra_threads=args.threads,
+                           inter_threads=args.inter_threads, int8=args.int8)
+    if not args.no_warmup:
+        det_cfg = load_camera_config(args.camera_config).get("detection") or {}
+        model.warmup(int(det_cfg.get("imgsz", 960)))
+    print(f"Model {args.model} ({backend}) ready in {time.perf_counter() - t0:.2f}s")
+    return model
+
+def run_job(model, args):
+    """Process the --video / --folder described by args with an already loaded model."""
+    args.camera_cfg = load_camera_config(args.camera_config)
+    tracker_cfg = get_tracker_cfg(args.tracker)
+
+    if args.live is not None:
+        process_live(model, tracker_cfg, args.live, args)
+
+    elif args.video:
         if not os.path.isfile(args.video):
             raise FileNotFoundError(args.video)
         process_video(model, tracker_cfg, args.video, "single_video", args)
@@ -211,7 +343,19 @@ def main():
         else:
             raise ValueError("No .avi videos or TestXXX folders found in input folder!")
     else:
-        raise ValueError("You must provide either --video or --folder")
+        raise ValueError("You must provide either --video, --folder or --live")
+
+def main():
+    args = build_parser().parse_args()
+    if not (args.video or args.folder or args.live is not None):
+        raise ValueError("You must provide either --video, --folder or --live")
+    # validate config before paying for model load
+    resolve_backend(args)
+    load_camera_config(args.camera_config)
+    get_tracker_cfg(args.tracker)
+
+    model = load_model(args)
+    run_job(model, args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,36 @@
+# src/detectors/base.py
+import numpy as np
+
+# backend name -> Detector subclass, filled by @register_detector
+DETECTORS = {}
+
+def register_detector(name):
+    def deco(cls):
+        cls.backend = name
+        DETECTORS[name] = cls
+        return cls
+    return deco
+
+class Detector:
+    """
+    Common interface for inference backends.
+    predict() runs one batch of BGR images at `imgsz` and returns, per image, an
+    (N, 6) float32 array of [x1, y1, x2, y2, conf, cls] in that image's pixels.
+    """
+    backend = None
+    names = {}
+
+    def predict(self, images, imgsz, conf=0.25, iou=0.5):
+        raise NotImplementedError
+
+    def warmup(self, imgsz=640):
+        """One dummy inference so lazy init (graph optimization, allocations) isn't paid by the first frame."""
+        self.predict([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], imgsz)
+
+def build_detector(backend, model_path, **opts):
+    # backends register themselves on import; heavy runtimes are imported lazily inside them
+    from src.detectors import ultralytics_backend, onnx_backend  # noqa: F401
+
+    if backend not in DETECTORS:
+        raise ValueError(f"Unknown detector backend '{backend}' (available: {', '.join(sorted(DETECTORS))})")
+    return DETECTORS[backend](model_path, **opts)
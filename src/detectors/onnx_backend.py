@@ -0,0 +1,131 @@
+# src/detectors/onnx_backend.py
+import ast
+import os
+import cv2
+import numpy as np
+
+from src.detectors.base import Detector, register_detector
+from src.detectors.tiling import nms
+
+# (model path, intra threads, inter threads) -> InferenceSession, reused across videos/jobs
+_SESSIONS = {}
+
+def get_session(model_path, intra_threads=0, inter_threads=0):
+    """One CPU InferenceSession per model file and thread setting for the whole process."""
+    import onnxruntime as ort
+
+    key = (os.path.abspath(model_path), int(intra_threads), int(inter_threads))
+    if key not in _SESSIONS:
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.intra_op_num_threads = int(intra_threads)   # 0 = let ORT pick (physical cores)
+        so.inter_op_num_threads = int(inter_threads)
+        so.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if inter_threads > 1
+                             else ort.ExecutionMode.ORT_SEQUENTIAL)
+        _SESSIONS[key] = ort.InferenceSession(key[0], sess_options=so, providers=["CPUExecutionProvider"])
+    return _SESSIONS[key]
+
+def quantize_model(model_path, out_path=None):
+    """Dynamic int8 weight quantization of a local ONNX model; returns the quantized file path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_path = out_path or model_path.rsplit(".", 1)[0] + ".int8.onnx"
+    if not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(model_path):
+        quantize_dynamic(model_path, out_path, weight_type=QuantType.QUInt8)
+    return out_path
+
+def letterbox(img, new_shape, stride=32, auto=False):
+    """
+    Resize keeping aspect ratio and pad with gray (114) like ultralytics.
+    auto=True pads only up to the next multiple of `stride` instead of the full square.
+    Returns (image, scale, (pad_x, pad_y)).
+    """
+    h, w = img.shape[:2]
+    new_h, new_w = new_shape
+    r = min(new_h / h, new_w / w)
+    unpad_w, unpad_h = int(round(w * r)), int(round(h * r))
+    dw, dh = new_w - unpad_w, new_h - unpad_h
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    if (w, h) != (unpad_w, unpad_h):
+        img = cv2.resize(img, (unpad_w, unpad_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh / 2 - 0.1)), int(round(dh / 2 + 0.1))
+    left, right = int(round(dw / 2 - 0.1)), int(round(dw / 2 + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return img, r, (left, top)
+
+@register_detector("onnx")
+class OnnxDetector(Detector):
+    """
+    Already-exported YOLOv8-style ONNX model (`yolo export format=onnx`) on ONNX Runtime CPU.
+    Pre/post-processing (letterbox, decode, NMS) is plain NumPy/OpenCV, so torch is never imported.
+    """
+    def __init__(self, model_path, intra_threads=0, inter_threads=0, int8=False, max_det=300, **opts):
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"ONNX model not found at {model_path}")
+        if int8:
+            model_path = quantize_model(model_path)
+        self.model_path = model_path
+        self.session = get_session(model_path, intra_threads, inter_threads)
+        self.max_det = max_det
+
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        _, _, h, w = inp.shape
+        # fixed H/W or batch in the exported graph override what callers ask for
+        self.fixed_hw = (h, w) if isinstance(h, int) and isinstance(w, int) else None
+        self.batch = inp.shape[0] if isinstance(inp.shape[0], int) else None
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+        self.stride = int(meta.get("stride", 32))
+        self.end2end = meta.get("end2end", "False") == "True"
+
+    def _preprocess(self, images, imgsz):
+        shape = self.fixed_hw or (imgsz, imgsz)
+        auto = self.fixed_hw is None and len({im.shape for im in images}) == 1
+        blobs, metas = [], []
+        for im in images:
+            lb, r, pad = letterbox(im, shape, self.stride, auto=auto)
+            blobs.append(lb[:, :, ::-1].transpose(2, 0, 1))   # BGR HWC -> RGB CHW
+            metas.append((r, pad, im.shape[:2]))
+        x = np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0
+        return x, metas
+
+    def _decode(self, pred, conf, iou):
+        """One image's raw output -> (N, 6) [x1, y1, x2, y2, conf, cls] in letterboxed pixels."""
+        if self.end2end:
+            det = pred[pred[:, 4] >= conf]
+            return det[:, :6].astype(np.float32)
+        p = pred.T                                       # (anchors, 4 + nc)
+        scores = p[:, 4:]
+        cls = scores.argmax(axis=1)
+        best = scores[np.arange(len(p)), cls]
+        keep = best >= conf
+        p, cls, best = p[keep], cls[keep], best[keep]
+        if len(p) == 0:
+            return np.zeros((0, 6), np.float32)
+        xy, wh = p[:, :2], p[:, 2:4] / 2.0
+        boxes = np.concatenate([xy - wh, xy + wh], axis=1)
+        k = nms(boxes, best, iou, cls)[:self.max_det]
+        return np.concatenate([boxes[k], best[k, None], cls[k, None]], axis=1).astype(np.float32)
+
+    def predict(self, images, imgsz, conf=0.25, iou=0.5):
+        x, metas = self._preprocess(images, imgsz)
+        step = self.batch or len(x)
+        outs = []
+        for i in range(0, len(x), step):
+            chunk = x[i:i + step]
+            n = len(chunk)
+            if n < step:   # static batch in the graph: pad the last chunk
+                chunk = np.concatenate([chunk, np.zeros((step - n,) + chunk.shape[1:], chunk.dtype)])
+            outs.append(self.session.run(None, {self.input_name: chunk})[0][:n])
+        preds = np.concatenate(outs)
+
+        results = []
+        for pred, (r, (px, py), (h, w)) in zip(preds, metas):
+            det = self._decode(pred, conf, iou)
+            det[:, [0, 2]] = ((det[:, [0, 2]] - px) / r).clip(0, w)
+            det[:, [1, 3]] = ((det[:, [1, 3]] - py) / r).clip(0, h)
+            results.append(det)
+        return results
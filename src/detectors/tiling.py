@@ -0,0 +1,132 @@
+# src/detectors/tiling.py
+import numpy as np
+
+def nms(boxes, scores, iou_thr, classes=None, metric="iou"):
+    """
+    Greedy NMS in NumPy. Returns kept indices, highest score first.
+    classes: optional per-box class ids; boxes of different classes never suppress each other.
+    metric:  "iou", or "ios" (intersection over the smaller box) which also removes
+             the partial boxes an object leaves in neighbouring tiles.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if classes is not None:
+        # shift each class into its own coordinate range so one pass handles all classes
+        offset = (np.asarray(classes, dtype=np.float32) * (boxes.max() + 1.0))[:, None]
+        boxes = boxes + offset
+    x1, y1, x2, y2 = boxes.T
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        if metric == "ios":
+            denom = np.minimum(areas[i], areas[rest])
+        else:
+            denom = areas[i] + areas[rest] - inter
+        overlap = inter / np.maximum(denom, 1e-9)
+        order = rest[overlap <= iou_thr]
+    return np.array(keep, dtype=np.int64)
+
+def _rect(r, frame_size, normalized=False):
+    width, height = frame_size
+    x1, y1, x2, y2 = [float(v) for v in r]
+    if normalized:
+        x1, x2 = x1 * width, x2 * width
+        y1, y2 = y1 * height, y2 * height
+    x1, y1 = max(0, int(round(x1))), max(0, int(round(y1)))
+    x2, y2 = min(width, int(round(x2))), min(height, int(round(y2)))
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Empty region of interest {list(r)} for frame {width}x{height}")
+    return x1, y1, x2, y2
+
+def _tile_starts(lo, hi, tile, stride):
+    if hi - lo <= tile:
+        return [lo]
+    starts = list(range(lo, hi - tile, stride))
+    starts.append(hi - tile)   # last tile flush with the edge
+    return starts
+
+def tile_grid(rect, tile_size, overlap):
+    """Overlapping tile_size x tile_size tiles covering rect (x1, y1, x2, y2)."""
+    x1, y1, x2, y2 = rect
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+    return [(tx, ty, min(tx + tile_size, x2), min(ty + tile_size, y2))
+            for ty in _tile_starts(y1, y2, tile_size, stride)
+            for tx in _tile_starts(x1, x2, tile_size, stride)]
+
+def plan_crops(frame_size, det_cfg):
+    """
+    List of (x1, y1, x2, y2, imgsz) crops the detector runs on for each frame.
+      mode: full  -> the whole frame at `imgsz`
+      mode: roi   -> each region of interest at `roi_imgsz`
+      mode: tiles -> overlapping `tile_size` tiles over the ROIs (or the whole frame) at
+                     `tile_imgsz`, plus the whole frame at `imgsz` if `tile_full_frame`
+    """
+    width, height = int(frame_size[0]), int(frame_size[1])
+    mode = det_cfg.get("mode", "full")
+    imgsz = int(det_cfg.get("imgsz", 960))
+    full = (0, 0, width, height)
+    rois = [_rect(r, (width, height), det_cfg.get("normalized", False)) for r in det_cfg.get("rois") or []]
+
+    if mode == "full":
+        return [full + (imgsz,)]
+    if mode == "roi":
+        if not rois:
+            raise ValueError("detection.mode 'roi' needs at least one entry in detection.rois")
+        roi_imgsz = int(det_cfg.get("roi_imgsz", imgsz))
+        return [r + (roi_imgsz,) for r in rois]
+    if mode == "tiles":
+        tile_size = int(det_cfg.get("tile_size", 640))
+        overlap = float(det_cfg.get("tile_overlap", 0.2))
+        tile_imgsz = int(det_cfg.get("tile_imgsz", tile_size))
+        crops = []
+        for r in rois or [full]:
+            crops += [t + (tile_imgsz,) for t in tile_grid(r, tile_size, overlap)]
+        if det_cfg.get("tile_full_frame", False):
+            crops.append(full + (imgsz,))
+        return crops
+    raise ValueError(f"Unknown detection.mode '{mode}' (expected full, roi or tiles)")
+
+class TiledDetector:
+    """
+    Runs the detector backend (src/detectors/base.py) only on the configured crops of
+    each frame, batched per input size, and merges the boxes back into frame
+    coordinates with class-aware NMS.
+    """
+    def __init__(self, model, det_cfg, frame_size, conf=0.3, iou=0.5):
+        self.model = model
+        self.conf = conf
+        self.iou = float(det_cfg.get("iou", iou))
+        self.crops = plan_crops(frame_size, det_cfg)
+        self.merge_metric = det_cfg.get("merge_metric", "ios" if len(self.crops) > 1 else "iou")
+        self.merge_iou = float(det_cfg.get("merge_iou", 0.7 if self.merge_metric == "ios" else self.iou))
+        self.by_size = {}
+        for c in self.crops:
+            self.by_size.setdefault(c[4], []).append(c[:4])
+        self.pixels_per_frame = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2, _ in self.crops)
+
+    def detect(self, frame):
+        """Returns (xyxy (N,4), conf (N,), cls (N,)) in frame coordinates."""
+        parts = []
+        for imgsz, rects in self.by_size.items():
+            images = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in rects]
+            for (x1, y1, _, _), det in zip(rects, self.model.predict(images, imgsz, self.conf, self.iou)):
+                if len(det):
+                    det = det.copy()
+                    det[:, [0, 2]] += x1
+                    det[:, [1, 3]] += y1
+                    parts.append(det)
+        if not parts:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+        det = np.concatenate(parts).astype(np.float32)
+        if len(self.crops) > 1:
+            det = det[nms(det[:, :4], det[:, 4], self.merge_iou, det[:, 5], self.merge_metric)]
+        return det[:, :4], det[:, 4], det[:, 5].astype(np.int64)
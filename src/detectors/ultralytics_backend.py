@@ -0,0 +1,17 @@
+# src/detectors/ultralytics_backend.py
+import numpy as np
+
+from src.detectors.base import Detector, register_detector
+
+@register_detector("ultralytics")
+class UltralyticsDetector(Detector):
+    """YOLO .pt models through ultralytics (pulls in torch)."""
+    def __init__(self, model_path, **opts):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.names = self.model.model.names if hasattr(self.model.model, "names") else {}
+
+    def predict(self, images, imgsz, conf=0.25, iou=0.5):
+        results = self.model.predict(images, imgsz=imgsz, conf=conf, iou=iou, verbose=False)
+        return [r.boxes.data.cpu().numpy()[:, :6].astype(np.float32) if r.boxes is not None
+                else np.zeros((0, 6), np.float32) for r in results]
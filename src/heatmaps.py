@@ -0,0 +1,131 @@
+# src/heatmaps.py
+import os
+import time
+import cv2
+import numpy as np
+
+from src.utils.locks import FileLock
+
+HEATMAP_DIR = os.path.join("outputs", "heatmaps")
+
+class HeatmapAccumulator:
+    """
+    Per-camera occupancy and dwell grids, updated from the centroids the RuleEngine
+    already computed for the rules (no extra pass over frames or alerts).
+      occupancy[label] - seconds an object of that label spent in each cell
+      dwell[label]     - seconds it spent there while stationary, i.e. moved less
+                         than dwell_px over dwell_window_sec (a window the engine tracks)
+    Grids are cell_px-downsampled and updated with one np.add.at per frame. They
+    are flushed every `save_every_sec` (None: only by flush(), with each checkpoint)
+    and added into outputs/heatmaps/<camera>.npz, so repeated runs over the same
+    camera accumulate.
+
+    Camera config:
+        heatmaps:
+          enabled: true
+          cell_px: 16
+          labels: [person, bag]
+          dwell_px: 40
+          save_every_sec: 60
+    """
+    def __init__(self, camera, frame_size, cell_px=16, labels=("person", "bag"), dwell_px=40,
+                 dwell_window_sec=None, save_every_sec=60, out_dir=HEATMAP_DIR, max_gap_sec=1.0):
+        self.camera = camera
+        self.frame_size = (int(frame_size[0]), int(frame_size[1]))
+        self.cell_px = int(cell_px)
+        self.labels = list(labels)
+        self.label_index = {l: i for i, l in enumerate(self.labels)}
+        self.dwell_px = float(dwell_px)
+        self.dwell_window_sec = dwell_window_sec
+        self.save_every_sec = float(save_every_sec)
+        self.out_dir = out_dir
+        self.max_gap_sec = float(max_gap_sec)
+        w, h = self.frame_size
+        self.shape = (len(self.labels), -(-h // self.cell_px), -(-w // self.cell_px))
+        self._reset()
+        self.background = None
+        self.last_t = None
+        self.last_save = time.monotonic()
+        self.flushed = False   # this run already counted in the file's `runs`
+
+    @classmethod
+    def from_config(cls, camera_cfg, frame_size, dwell_window_sec=None):
+        """None unless the camera config has `heatmaps: {enabled: true, ...}`."""
+        cfg = dict(camera_cfg.get("heatmaps") or {})
+        if not cfg.pop("enabled", False):
+            return None
+        return cls(camera_cfg.get("camera", "default"), frame_size, dwell_window_sec=dwell_window_sec, **cfg)
+
+    def _reset(self):
+        self.occupancy = np.zeros(self.shape, dtype=np.float32)
+        self.dwell = np.zeros(self.shape, dtype=np.float32)
+        self.seconds = 0.0
+
+    def update(self, ctx, now, frame=None):
+        """Add one frame; ctx is the engine's FrameContext (None when nothing was tracked)."""
+        dt = min(max(0.0, now - self.last_t), self.max_gap_sec) if self.last_t is not None else 0.0
+        self.last_t = now
+        self.seconds += dt
+        if self.background is None and frame is not None:
+            self.background = cv2.resize(frame, (self.shape[2] * 8, self.shape[1] * 8), interpolation=cv2.INTER_AREA)
+        if ctx is None or dt == 0.0 or not len(ctx.ids):
+            return
+        li = np.array([self.label_index.get(l, -1) for l in ctx.labels], dtype=np.int64)
+        keep = li >= 0
+        if not keep.any():
+            return
+        cells = np.floor(ctx.centroids[keep] / self.cell_px).astype(np.int64)
+        gx = np.clip(cells[:, 0], 0, self.shape[2] - 1)
+        gy = np.clip(cells[:, 1], 0, self.shape[1] - 1)
+        li = li[keep]
+        np.add.at(self.occupancy, (li, gy, gx), dt)
+
+        if self.dwell_window_sec is not None:
+            disp, _, count = ctx.displacement(self.dwell_window_sec)
+            still = (disp[keep] < self.dwell_px) & (count[keep] > 1)
+            np.add.at(self.dwell, (li[still], gy[still], gx[still]), dt)
+
+        if self.save_every_sec is not None and time.monotonic() - self.last_save >= self.save_every_sec:
+            self.flush()
+
+    def path(self):
+        return os.path.join(self.out_dir, f"{self.camera}.npz")
+
+    def flush(self):
+        """Add the grids gathered since the last flush into the camera's .npz file."""
+        self.last_save = time.monotonic()
+        if self.seconds == 0.0:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = self.path()
+        with FileLock(path + ".lock"):
+            data = load_heatmap(path)
+            if data is not None and (list(data["labels"]) != self.labels or data["occupancy"].shape != self.shape):
+                # a different resolution/grid for the same camera name: keep it in its own file
+                w, h = self.frame_size
+                path = os.path.join(self.out_dir, f"{self.camera}_{w}x{h}_c{self.cell_px}.npz")
+                data = load_heatmap(path)
+            occupancy, dwell, seconds = self.occupancy, self.dwell, self.seconds
+            runs = 0 if self.flushed else 1
+            background = self.background
+            if data is not None:
+                occupancy = occupancy + data["occupancy"]
+                dwell = dwell + data["dwell"]
+                seconds += float(data["seconds"])
+                runs += int(data["runs"])
+                if data["background"].size:
+                    background = data["background"]
+            tmp = path + ".tmp.npz"
+            np.savez_compressed(tmp, occupancy=occupancy, dwell=dwell, labels=np.array(self.labels),
+                                cell_px=self.cell_px, frame_size=np.array(self.frame_size), seconds=seconds,
+                                runs=runs, background=background if background is not None else np.zeros(0, np.uint8))
+            os.replace(tmp, path)
+        self.flushed = True
+        self._reset()
+
+def load_heatmap(path):
+    """Dict of arrays from a heatmap .npz, or None if it doesn't exist."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
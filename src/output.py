@@ -0,0 +1,198 @@
+# src/output.py
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+from src.utils.draw import draw_tracks, draw_zones
+
+DEFAULT_OUTPUT_CFG = {
+    "mode": "full",          # full: whole annotated video | clips: only around alerts
+    "fps": 0,                # 0 = source fps; lower keeps every k-th frame
+    "max_width": 0,          # 0 = source resolution
+    "encoder": "auto",       # auto (ffmpeg if on PATH, else OpenCV) | ffmpeg | opencv
+    "preset": "veryfast",    # ffmpeg x264 preset
+    "crf": 28,
+    "clip_pre_sec": 5,
+    "clip_post_sec": 5,
+    "clip_buffer_mb": 512,   # memory cap for the clip_pre_sec ring of raw frames
+    "queue_size": 64,
+}
+
+def annotate(frame, tracked, alerts, zone_map=None):
+    """Annotated copy of a frame; the original stays untouched for detection/snapshots."""
+    out = frame.copy()
+    draw_zones(out, zone_map)
+    draw_tracks(out, tracked, alerts, None)
+    return out
+
+class FFmpegSink:
+    """Pipes raw BGR frames into a local ffmpeg (libx264)."""
+    def __init__(self, path, fps, size, preset="veryfast", crf=28):
+        self.path = path
+        cmd = ["ffmpeg", "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{size[0]}x{size[1]}", "-r", f"{fps:.3f}", "-i", "-",
+               "-an", "-c:v", "libx264", "-preset", str(preset), "-crf", str(crf), "-pix_fmt", "yuv420p", path]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.proc.returncode} writing {self.path}")
+
+class OpenCVSink:
+    """cv2.VideoWriter (mp4v) fallback when ffmpeg is not installed."""
+    def __init__(self, path, fps, size, **_):
+        self.path = path
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def close(self):
+        self.writer.release()
+
+def open_sink(path, fps, size, encoder="auto", preset="veryfast", crf=28):
+    if encoder == "auto":
+        encoder = "ffmpeg" if shutil.which("ffmpeg") else "opencv"
+    if encoder == "ffmpeg":
+        return FFmpegSink(path, fps, size, preset=preset, crf=crf)
+    if encoder == "opencv":
+        return OpenCVSink(path, fps, size)
+    raise ValueError(f"Unknown output.encoder '{encoder}' (expected auto, ffmpeg or opencv)")
+
+class VideoOutput:
+    """
+    Annotated video output off the inference thread.
+    submit() only queues the frame with its tracks/alerts; a background thread
+    annotates a copy, downscales and encodes it. With `fps` set, only every k-th
+    frame is kept. In `clips` mode nothing is written until an alert, then the
+    last clip_pre_sec seconds (ring buffer) and the next clip_post_sec seconds go
+    into one clip per alert burst. The ring holds raw frames at output size and
+    is capped at clip_buffer_mb, which shortens the pre-roll for large frames.
+    """
+    def __init__(self, out_name, fps, frame_size, cfg=None, zone_map=None, out_dir="outputs"):
+        cfg = {**DEFAULT_OUTPUT_CFG, **(cfg or {})}
+        if cfg["mode"] not in ("full", "clips"):
+            raise ValueError(f"Unknown output.mode '{cfg['mode']}' (expected full or clips)")
+        self.cfg = cfg
+        self.mode = cfg["mode"]
+        self.out_name = out_name
+        self.zone_map = zone_map
+        self.step = max(1, int(round(fps / cfg["fps"]))) if cfg["fps"] else 1
+        self.fps = fps / self.step
+
+        width, height = frame_size
+        max_width = int(cfg["max_width"])
+        if max_width and width > max_width:
+            width, height = max_width, int(round(height * max_width / width))
+        # x264/yuv420p needs even dimensions
+        self.size = (width - width % 2, height - height % 2)
+        self.resize = self.size != tuple(frame_size)
+
+        self.stamp = int(time.time())
+        self.dir = os.path.join(out_dir, "videos" if self.mode == "full" else "clips")
+        os.makedirs(self.dir, exist_ok=True)
+        self.sink = None
+        if self.mode == "full":
+            self.sink = self._open(f"out_{out_name}_{self.stamp}.mp4")
+            print("Saving to:", self.sink.path)
+        pre_frames = int(cfg["clip_pre_sec"] * self.fps) + 1
+        fit = max(1, int(cfg["clip_buffer_mb"] * 1024 ** 2) // (self.size[0] * self.size[1] * 3))
+        if self.mode == "clips" and fit < pre_frames:
+            print(f"Clips: pre-roll limited to {fit / self.fps:.1f}s at {self.size[0]}x{self.size[1]} "
+                  f"by clip_buffer_mb={cfg['clip_buffer_mb']}; lower max_width to keep {cfg['clip_pre_sec']}s")
+        self.ring = deque(maxlen=min(pre_frames, fit))
+        self.clip_until = None
+        self.clips = []
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.pending_alerts = []   # alerts on frames skipped by decimation, carried to the next kept frame
+        self.error = None
+        self.queue = queue.Queue(maxsize=int(cfg["queue_size"]))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _open(self, fname):
+        return open_sink(os.path.join(self.dir, fname), self.fps, self.size,
+                         self.cfg["encoder"], self.cfg["preset"], self.cfg["crf"])
+
+    def submit(self, frame_id, video_time_sec, frame, tracked, alerts, block=True):
+        """Hand a frame to the output thread; it must not be modified afterwards. block=False drops it if the queue is full."""
+        if self.error is not None:
+            raise RuntimeError(f"Video output failed: {self.error}")
+        self.submitted += 1
+        self.pending_alerts += alerts
+        if (self.submitted - 1) % self.step:
+            return
+        item = (frame_id, video_time_sec, frame, tracked, self.pending_alerts)
+        self.pending_alerts = []
+        try:
+            self.queue.put(item, block=block)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue   # keep draining so submit() never blocks on a dead writer
+            try:
+                self._write(*item)
+            except Exception as e:
+                self.error = repr(e)
+
+    def _write(self, frame_id, video_time_sec, frame, tracked, alerts):
+        out = annotate(frame, tracked, alerts, self.zone_map)
+        if self.resize:
+            out = cv2.resize(out, self.size, interpolation=cv2.INTER_AREA)
+
+        if self.mode == "full":
+            self.sink.write(out)
+            self.written += 1
+            return
+
+        if alerts:
+            if self.sink is None:
+                self.sink = self._open(f"{self.out_name}_{self.stamp}_{frame_id:06d}.mp4")
+                self.clips.append(self.sink.path)
+                for f in self.ring:
+                    self.sink.write(f)
+                self.written += len(self.ring)
+                self.ring.clear()
+            self.clip_until = video_time_sec + self.cfg["clip_post_sec"]
+        if self.sink is None:
+            self.ring.append(out)
+            return
+        self.sink.write(out)
+        self.written += 1
+        if video_time_sec >= self.clip_until:
+            self.sink.close()
+            self.sink = None
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        if self.error is not None:
+            raise RuntimeError(f"Video output failed: {self.error}")
+        msg = f"Video output: {self.written} frames written at {self.fps:.1f} fps {self.size[0]}x{self.size[1]}"
+        if self.mode == "clips":
+            msg += f", {len(self.clips)} alert clips in {self.dir}"
+        if self.dropped:
+            msg += f", {self.dropped} dropped (queue full)"
+        print(msg)
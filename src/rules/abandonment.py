@@ -1,5 +1,6 @@
-import math
-from collections import defaultdict, deque
+import numpy as np
+
+from src.rules.base import Rule, register_rule
 
 def iou(a, b):
     ax1,ay1,ax2,ay2 = a; bx1,by1,bx2,by2 = b
@@ -11,81 +12,89 @@ def iou(a, b):
     u = aarea + barea - inter
     return inter / u if u > 0 else 0.0
 
-class AbandonmentRule:
+@register_rule("abandonment")
+class AbandonmentRule(Rule):
     """
     Flags a BAG that remains stationary and unattended for N seconds.
     - stationary: bbox center displacement < bag_stationary_px in window
     - unattended: no PERSON centroid within 'near_px' for 'unattended_sec'
     """
-    def __init__(self, fps, window_sec=6, bag_stationary_px=20, unattended_sec=10, near_px=120):
+    state_keys = ("bag_last_near_person", "bag_last_alert_time")
+
+    def __init__(self, fps, window_sec=6, bag_stationary_px=20, unattended_sec=10, near_px=120,
+                 zones=None, zone_params=None):
+        super().__init__(zones, zone_params)
         self.fps = max(1, int(fps))
-        self.win = int(window_sec * self.fps)
-        self.unatt_frames = int(unattended_sec * self.fps)
+        self.window_sec = window_sec
+        self.stationary_px = float(bag_stationary_px)
+        self.unattended_sec = unattended_sec
         self.near_px = float(near_px)
-        self.bag_hist = defaultdict(lambda: deque(maxlen=self.win))
-        self.bag_last_near_person = defaultdict(int)
-        self.bag_last_alert_frame = {}
-        self.bag_label_set = set(["backpack","handbag","suitcase","bag"])  # harmonize
+        self.bag_last_near_person = {}   # tid -> timestamp a person was last within near_px
+        self.bag_last_alert_time = {}
+        self.bag_label_set = ["backpack","handbag","suitcase","bag"]  # harmonize
 
-    @staticmethod
-    def _centroid(xyxy):
-        x1,y1,x2,y2 = xyxy
-        return ((x1+x2)/2.0, (y1+y2)/2.0)
+    def windows(self):
+        return sorted(float(w) for w in self.param_values("window_sec", self.window_sec))
 
-    def update(self, tracked, frame_id, video_time_sec):
+    def _params(self, zid):
+        """(window sec, stationary px, unattended sec, near px) for a zone."""
+        return (float(self.zone_param(zid, "window_sec", self.window_sec)),
+                float(self.zone_param(zid, "bag_stationary_px", self.stationary_px)),
+                float(self.zone_param(zid, "unattended_sec", self.unattended_sec)),
+                float(self.zone_param(zid, "near_px", self.near_px)))
+
+    def evaluate(self, ctx):
         alerts = []
-        persons = [t for t in tracked if t["label"] == "person"]
-        bags    = [t for t in tracked if t["label"] in self.bag_label_set]
+        bags = self.in_scope(ctx, ctx.indices(self.bag_label_set))
+        if bags.size == 0:
+            return alerts
+        # persons anywhere in the frame can attend a bag, so they are not zone-filtered
+        persons = ctx.indices(["person"])
+        frame_id = ctx.frame_id
+        now = ctx.video_time_sec
 
-        # update bag histories
-        for b in bags:
-            self.bag_hist[b["id"]].append(self._centroid(b["xyxy"]))
+        # nearest person distance for every bag at once
+        if persons.size:
+            d = ctx.centroids[bags][:, None, :] - ctx.centroids[persons][None, :, :]
+            min_d = np.hypot(d[..., 0], d[..., 1]).min(axis=1)
+        else:
+            min_d = np.full(bags.size, 1e9)
 
-        # compute if bag is stationary
-        for b in bags:
-            tid = b["id"]
-            H = self.bag_hist[tid]
-            stationary = False
-            if len(H) >= max(6, int(self.fps*0.5)):
-                x0,y0 = H[0]
-                x1,y1 = H[-1]
-                disp = math.hypot(x1-x0, y1-y0)
-                stationary = disp < 20.0  # override if you want 'bag_stationary_px'
+        for j, i in enumerate(bags.tolist()):
+            tid = int(ctx.ids[i])
+            z = ctx.zone[i]
+            win, stationary_px, unattended_sec, near_px = self._params(z)
 
-            # compute nearest person distance
-            bc = self._centroid(b["xyxy"])
-            near_any = False
-            min_d = 1e9
-            for p in persons:
-                pc = self._centroid(p["xyxy"])
-                d = math.hypot(pc[0]-bc[0], pc[1]-bc[1])
-                if d < min_d:
-                    min_d = d
-                if d <= self.near_px:
-                    near_any = True
-                    break
+            # compute if bag is stationary (at least ~0.5s of history)
+            disp, span, count = ctx.displacement(win)
+            stationary = count[i] >= 6 and span[i] >= 0.5 - 1.0 / self.fps - 1e-6 and disp[i] < stationary_px
 
             # Update last near timestamp
-            if near_any:
-                self.bag_last_near_person[tid] = frame_id
+            if min_d[j] <= near_px:
+                self.bag_last_near_person[tid] = now
 
             # Abandonment if stationary + no near person for long
-            last_near = self.bag_last_near_person.get(tid, 0)
-            unattended_long = (frame_id - last_near) >= self.unatt_frames
+            last_near = self.bag_last_near_person.get(tid, ctx.start_time)
+            unattended_long = (now - last_near) >= unattended_sec
 
             if stationary and unattended_long:
                 # de-dup at ~5s
-                if tid not in self.bag_last_alert_frame or (frame_id - self.bag_last_alert_frame[tid]) > int(self.fps*5):
+                if tid not in self.bag_last_alert_time or (now - self.bag_last_alert_time[tid]) > 5:
                     alerts.append({
                         "type": "ABANDONED_BAG",
                         "label": "bag",
-                        "id": int(tid),
+                        "id": tid,
                         "score": 1.0,
                         "frame": int(frame_id),
-                        "video_time_sec": float(video_time_sec),
-                        "xyxy": list(map(int, b["xyxy"])),
-                        "extra": f"min_person_dist={min_d:.1f}px"
+                        "video_time_sec": float(ctx.video_time_sec),
+                        "xyxy": list(map(int, ctx.tracked[i]["xyxy"])),
+                        "extra": f"min_person_dist={min_d[j]:.1f}px" + (f" zone={ctx.zone_name(i)}" if z else "")
                     })
-                    self.bag_last_alert_frame[tid] = frame_id
+                    self.bag_last_alert_time[tid] = now
 
         return alerts
+
+    def forget(self, tids):
+        for tid in tids:
+            self.bag_last_near_person.pop(tid, None)
+            self.bag_last_alert_time.pop(tid, None)
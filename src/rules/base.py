@@ -0,0 +1,75 @@
+# src/rules/base.py
+import numpy as np
+
+# name -> Rule subclass, filled by @register_rule
+RULES = {}
+
+def register_rule(name):
+    """Class decorator that makes a rule selectable by name from camera configs."""
+    def deco(cls):
+        cls.name = name
+        RULES[name] = cls
+        return cls
+    return deco
+
+class Rule:
+    """
+    Base class for rules dispatched by the RuleEngine.
+    A rule never walks `tracked` or keeps centroid history itself: it reads the
+    shared FrameContext built once per frame by the engine.
+
+    Every rule accepts two optional zone settings from the camera config:
+      zones:       only evaluate objects whose centroid lies in one of these zones
+      zone_params: per-zone overrides of the rule's own parameters
+    """
+    name = None
+    # attributes holding per-track state, saved in checkpoints
+    state_keys = ()
+
+    def __init__(self, zones=None, zone_params=None):
+        self.zones = list(zones) if zones else None
+        self.zone_params = {str(k): dict(v or {}) for k, v in (zone_params or {}).items()}
+        self.scope = None            # array of allowed zone ids, None = whole frame
+        self._zone_overrides = {}    # zone id -> params
+
+    def bind_zones(self, zone_map):
+        """Resolve zone names against the camera's ZoneMap (None when no zones are defined)."""
+        if zone_map is None:
+            if self.zones or self.zone_params:
+                raise ValueError(f"Rule '{self.name}' references zones but the camera config defines none")
+            return
+        if self.zones:
+            self.scope = np.array(sorted(zone_map.zone_id(z) for z in self.zones), dtype=np.int64)
+        self._zone_overrides = {zone_map.zone_id(z): p for z, p in self.zone_params.items()}
+
+    def in_scope(self, ctx, idx):
+        """Filter object indices down to this rule's zones."""
+        if self.scope is None or idx.size == 0:
+            return idx
+        return idx[np.isin(ctx.zone[idx], self.scope)]
+
+    def zone_param(self, zid, key, default):
+        return self._zone_overrides.get(int(zid), {}).get(key, default)
+
+    def param_values(self, key, default):
+        """Every value `key` can take across zones (default + overrides)."""
+        return {default} | {p[key] for p in self.zone_params.values() if key in p}
+
+    def windows(self):
+        """History windows (in seconds) whose displacement this rule reads from the context."""
+        return []
+
+    def evaluate(self, ctx):
+        """Return a list of alert dicts for the current frame."""
+        raise NotImplementedError
+
+    def forget(self, tids):
+        """Drop per-track state for tracks the engine has pruned."""
+        pass
+
+    def state_dict(self):
+        return {k: getattr(self, k) for k in self.state_keys}
+
+    def load_state_dict(self, state):
+        for k in self.state_keys:
+            setattr(self, k, state[k])
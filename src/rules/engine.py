@@ -0,0 +1,220 @@
+# src/rules/engine.py
+import numpy as np
+
+from src.rules.base import RULES
+from src.utils.zones import ZoneMap
+# built-in rules register themselves on import
+from src.rules import loitering, abandonment  # noqa: F401
+
+class TrackHistory:
+    """
+    Per-track (timestamp, centroid) ring buffers shared by all rules.
+    Windows are in seconds of timestamp, so they stay correct when frames are
+    dropped (live mode) or a track is missed for a few frames; finding the oldest
+    sample inside a window is a binary search over the time-ordered ring.
+    """
+    def __init__(self, maxlen):
+        self.maxlen = max(2, int(maxlen))
+        self.buf = {}        # tid -> (N,3) float ring of [t, cx, cy]
+        self.count = {}      # tid -> total pushes
+        self.last_seen = {}  # tid -> timestamp of last push
+
+    def push(self, ids, centroids, t):
+        for tid, c in zip(ids.tolist(), centroids):
+            ring = self.buf.get(tid)
+            if ring is None:
+                ring = np.zeros((self.maxlen, 3), dtype=np.float64)
+                self.buf[tid] = ring
+                self.count[tid] = 0
+            n = self.count[tid]
+            row = ring[n % self.maxlen]
+            row[0] = t
+            row[1:] = c
+            self.count[tid] = n + 1
+            self.last_seen[tid] = t
+
+    def displacement(self, ids, window_sec, now):
+        """
+        For every id: displacement between the newest centroid and the oldest one
+        newer than `window_sec` ago, the seconds between those two samples, and how
+        many samples lie in the window.
+        """
+        n = len(ids)
+        disp = np.zeros(n, dtype=np.float64)
+        span = np.zeros(n, dtype=np.float64)
+        count = np.zeros(n, dtype=np.int64)
+        since = now - window_sec + 1e-6     # strictly newer than now - window
+        for i, tid in enumerate(ids.tolist()):
+            cnt = self.count.get(tid, 0)
+            if cnt == 0:
+                continue
+            ring = self.buf[tid]
+            kept = min(cnt, self.maxlen)
+            first = cnt - kept                      # logical index of the oldest kept sample
+            lo, hi = 0, kept - 1
+            while lo < hi:                          # first sample with t >= since
+                mid = (lo + hi) // 2
+                if ring[(first + mid) % self.maxlen, 0] >= since:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            old = ring[(first + lo) % self.maxlen]
+            new = ring[(cnt - 1) % self.maxlen]
+            disp[i] = np.hypot(new[1] - old[1], new[2] - old[2])
+            span[i] = new[0] - old[0]
+            count[i] = kept - lo
+        return disp, span, count
+
+    def prune(self, now, max_inactive_sec):
+        stale = [tid for tid, t in self.last_seen.items() if now - t > max_inactive_sec]
+        for tid in stale:
+            del self.buf[tid], self.count[tid], self.last_seen[tid]
+        return stale
+
+class FrameContext:
+    """
+    Per-frame data derived once from `tracked` and shared by every rule:
+    ids, labels, boxes and centroids as arrays, per-label index sets and
+    displacement over the windows requested by the registered rules.
+    `video_time_sec` is the frame's timestamp: position in the file, or wall-clock
+    seconds since the stream started in live mode. Rules measure time with it.
+    """
+    def __init__(self, tracked, frame_id, video_time_sec, fps, zone_map=None, start_time=0.0):
+        self.tracked = tracked
+        self.frame_id = frame_id
+        self.video_time_sec = video_time_sec
+        self.start_time = start_time
+        self.fps = fps
+        self.ids = np.array([t["id"] for t in tracked], dtype=np.int64)
+        self.labels = [t["label"] for t in tracked]
+        self.xyxy = np.array([t["xyxy"] for t in tracked], dtype=np.float64).reshape(-1, 4)
+        self.centroids = (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2.0
+        self.zone_map = zone_map
+        # zone id per object (0 = outside every zone), one vectorized mask lookup
+        self.zone = zone_map.lookup(self.centroids) if zone_map is not None else np.zeros(len(tracked), dtype=np.int64)
+        by_label = {}
+        for i, lbl in enumerate(self.labels):
+            by_label.setdefault(lbl, []).append(i)
+        self.by_label = {k: np.array(v, dtype=np.int64) for k, v in by_label.items()}
+        self._disp = {}
+
+    def indices(self, labels):
+        """Indices of tracked objects whose label is in `labels`."""
+        parts = [self.by_label[l] for l in labels if l in self.by_label]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+
+    def zone_name(self, i):
+        return self.zone_map.names[self.zone[i]] if self.zone_map is not None else None
+
+    def displacement(self, window_sec):
+        """(disp, span_sec, count) arrays aligned with `tracked` for a window registered by some rule."""
+        return self._disp[window_sec]
+
+class RuleEngine:
+    """
+    Runs all configured rules in a single pass per frame.
+    """
+    def __init__(self, rules, fps, max_inactive_sec=30, zone_map=None):
+        self.rules = list(rules)
+        self.fps = max(1, int(fps))
+        self.zone_map = zone_map
+        for rule in self.rules:
+            rule.bind_zones(zone_map)
+        # when every rule is zone-scoped, objects outside all of them need no history
+        scopes = [r.scope for r in self.rules]
+        self.history_scope = (np.unique(np.concatenate(scopes))
+                              if scopes and all(sc is not None for sc in scopes) else None)
+        self.windows = sorted({w for r in self.rules for w in r.windows()})
+        # enough samples for the longest window at the source frame rate
+        self.history = TrackHistory(int(np.ceil(max(self.windows, default=0) * max(1.0, float(fps)))) + 2)
+        self.max_inactive_sec = float(max_inactive_sec)
+        self.start_time = None
+        self.last_prune = None
+        self.ctx = None   # FrameContext of the last update (None if nothing was tracked)
+
+    @classmethod
+    def from_config(cls, cfg, fps, frame_size=None):
+        """
+        Build an engine from a camera config dict:
+            zones:
+              doorway: {polygon: [[x, y], ...]}
+            rules:
+              loitering: {window_sec: 12, min_disp_px: 40, zones: [doorway],
+                          zone_params: {doorway: {window_sec: 8}}}
+              abandonment: {enabled: false}
+        frame_size (width, height) is needed to rasterize zones.
+        """
+        rules = []
+        for name, params in (cfg.get("rules") or {}).items():
+            params = dict(params or {})
+            if not params.pop("enabled", True):
+                continue
+            if name not in RULES:
+                raise ValueError(f"Unknown rule '{name}' (available: {', '.join(sorted(RULES))})")
+            rules.append(RULES[name](fps=fps, **params))
+        zone_map = None
+        if cfg.get("zones"):
+            if frame_size is None:
+                raise ValueError("Camera config defines zones but no frame size was given")
+            zone_map = ZoneMap(cfg["zones"], frame_size)
+        engine = cfg.get("engine") or {}
+        return cls(rules, fps, max_inactive_sec=engine.get("max_inactive_sec", 30), zone_map=zone_map)
+
+    def update(self, tracked, frame_id, video_time_sec):
+        if self.start_time is None:
+            # first timestamp this engine saw; "never seen near a person" counts from here
+            self.start_time = self.last_prune = video_time_sec
+        if not tracked:
+            self.ctx = None
+            return []
+        now = video_time_sec
+        ctx = FrameContext(tracked, frame_id, now, self.fps, self.zone_map, self.start_time)
+        self.ctx = ctx
+        if self.history_scope is None:
+            self.history.push(ctx.ids, ctx.centroids, now)
+            for w in self.windows:
+                ctx._disp[w] = self.history.displacement(ctx.ids, w, now)
+        else:
+            keep = np.isin(ctx.zone, self.history_scope)
+            self.history.push(ctx.ids[keep], ctx.centroids[keep], now)
+            for w in self.windows:
+                disp = np.zeros(len(tracked), dtype=np.float64)
+                span = np.zeros(len(tracked), dtype=np.float64)
+                count = np.zeros(len(tracked), dtype=np.int64)
+                disp[keep], span[keep], count[keep] = self.history.displacement(ctx.ids[keep], w, now)
+                ctx._disp[w] = (disp, span, count)
+
+        alerts = []
+        for rule in self.rules:
+            alerts += rule.evaluate(ctx)
+
+        # prune once per second so idle tracks don't accumulate
+        if now - self.last_prune >= 1.0:
+            self.last_prune = now
+            stale = self.history.prune(now, self.max_inactive_sec)
+            if stale:
+                for rule in self.rules:
+                    rule.forget(stale)
+        return alerts
+
+    def state_dict(self):
+        """Track history, timers and per-rule state, for checkpoints."""
+        h = self.history
+        return {"history": {"maxlen": h.maxlen, "buf": h.buf, "count": h.count, "last_seen": h.last_seen},
+                "start_time": self.start_time,
+                "last_prune": self.last_prune,
+                "rules": {r.name: r.state_dict() for r in self.rules}}
+
+    def load_state_dict(self, state):
+        hist = state["history"]
+        rules = state["rules"]
+        if (hist["maxlen"] != self.history.maxlen or set(rules) != {r.name for r in self.rules}
+                or any(set(r.state_keys) - set(rules[r.name]) for r in self.rules)):
+            raise ValueError("checkpointed rule state does not match the current camera config")
+        self.history.buf, self.history.count, self.history.last_seen = hist["buf"], hist["count"], hist["last_seen"]
+        self.start_time = state["start_time"]
+        self.last_prune = state["last_prune"]
+        for rule in self.rules:
+            rule.load_state_dict(state["rules"][rule.name])
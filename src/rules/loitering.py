@@ -1,52 +1,55 @@
-import math
-from collections import defaultdict, deque
+from src.rules.base import Rule, register_rule
 
-class LoiteringRule:
+@register_rule("loitering")
+class LoiteringRule(Rule):
     """
     Flags a PERSON who stays nearly stationary (low displacement) for a time window.
     """
-    def __init__(self, fps, window_sec=12, min_disp_px=40):
+    state_keys = ("last_alert_time",)
+
+    def __init__(self, fps, window_sec=12, min_disp_px=40, zones=None, zone_params=None):
+        super().__init__(zones, zone_params)
         self.fps = max(1, int(fps))
-        self.win = int(window_sec * self.fps)
+        self.window_sec = window_sec
         self.min_disp = float(min_disp_px)
-        self.hist = defaultdict(lambda: deque(maxlen=self.win))
-        self.last_alert_frame = {}
+        self.last_alert_time = {}
 
-    @staticmethod
-    def _centroid(xyxy):
-        x1,y1,x2,y2 = xyxy
-        return ((x1+x2)/2.0, (y1+y2)/2.0)
+    def windows(self):
+        return sorted(float(w) for w in self.param_values("window_sec", self.window_sec))
 
-    def update(self, tracked, frame_id, video_time_sec):
+    def evaluate(self, ctx):
         alerts = []
-        # update histories of persons only
-        for t in tracked:
-            if t["label"] != "person": 
-                continue
-            c = self._centroid(t["xyxy"])
-            self.hist[t["id"]].append(c)
+        idx = self.in_scope(ctx, ctx.indices(["person"]))
+        frame_id = ctx.frame_id
+        now = ctx.video_time_sec
 
         # check displacement over window
-        for t in tracked:
-            if t["label"] != "person":
+        for i in idx.tolist():
+            z = ctx.zone[i]
+            win = float(self.zone_param(z, "window_sec", self.window_sec))
+            min_disp = float(self.zone_param(z, "min_disp_px", self.min_disp))
+            disp, span, count = ctx.displacement(win)
+            # stationary for full window (history covers it to within one frame)
+            if count[i] < 6 or span[i] < win - 1.0 / self.fps - 1e-6 or disp[i] >= min_disp:
                 continue
-            tid = t["id"]
-            H = self.hist[tid]
-            if len(H) >= max(6, int(self.fps*0.5)):  # at least 0.5s
-                x0,y0 = H[0]
-                x1,y1 = H[-1]
-                disp = math.hypot(x1-x0, y1-y0)
-                if disp < self.min_disp and len(H) == H.maxlen:  # stationary for full window
-                    # de-dup within ~3 seconds
-                    if tid not in self.last_alert_frame or (frame_id - self.last_alert_frame[tid]) > int(self.fps*3):
-                        alerts.append({
-                            "type": "LOITERING",
-                            "label": "person",
-                            "id": int(tid),
-                            "score": float(max(0.0, (self.min_disp - disp) / self.min_disp)),
-                            "frame": int(frame_id),
-                            "video_time_sec": float(video_time_sec),
-                            "xyxy": list(map(int, t["xyxy"]))
-                        })
-                        self.last_alert_frame[tid] = frame_id
+            tid = int(ctx.ids[i])
+            # de-dup within ~3 seconds
+            if tid not in self.last_alert_time or (now - self.last_alert_time[tid]) > 3:
+                alert = {
+                    "type": "LOITERING",
+                    "label": "person",
+                    "id": tid,
+                    "score": float(max(0.0, (min_disp - disp[i]) / min_disp)),
+                    "frame": int(frame_id),
+                    "video_time_sec": float(ctx.video_time_sec),
+                    "xyxy": list(map(int, ctx.tracked[i]["xyxy"]))
+                }
+                if z:
+                    alert["extra"] = f"zone={ctx.zone_name(i)}"
+                alerts.append(alert)
+                self.last_alert_time[tid] = now
         return alerts
+
+    def forget(self, tids):
+        for tid in tids:
+            self.last_alert_time.pop(tid, None)
@@ -0,0 +1,133 @@
+# src/sources.py
+import os
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+def open_capture(source):
+    """cv2.VideoCapture for a device index ("0"), stream URL (rtsp://, http://) or file path."""
+    src = int(source) if str(source).isdigit() else source
+    cap = cv2.VideoCapture(src)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video source {source}")
+    # keep the driver-side queue short so frames aren't stale before we even see them
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+class LatestFrameReader:
+    """
+    Reader thread that always keeps only the newest frame.
+    Frames the consumer is too slow to take are overwritten and counted as
+    dropped. A local file is replayed at its native fps as a live stand-in.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.cap = open_capture(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.pace = os.path.isfile(str(source))
+        self.cond = threading.Condition()
+        self.latest = None       # (seq, capture_time, frame)
+        self.seq = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        period = 1.0 / self.fps
+        next_t = time.monotonic()
+        while self.running:
+            ok, frame = self.cap.read()
+            if not ok:
+                break
+            if self.pace:
+                next_t += period
+                delay = next_t - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            with self.cond:
+                self.seq += 1
+                self.latest = (self.seq, time.monotonic(), frame)
+                self.cond.notify()
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def read(self, after_seq):
+        """Block until a frame newer than `after_seq` exists; None once the source has ended."""
+        with self.cond:
+            while self.running and (self.latest is None or self.latest[0] <= after_seq):
+                self.cond.wait(timeout=1.0)
+            if self.latest is None or self.latest[0] <= after_seq:
+                return None
+            return self.latest
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=2.0)
+        self.cap.release()
+
+class LiveStats:
+    """End-to-end latency (capture -> processed), frame drop and load shedding counters."""
+    def __init__(self):
+        self.latencies = deque(maxlen=1000)   # summary() percentiles cover the last 1000 frames
+        self.processed = 0
+        self.dropped_reader = 0   # overwritten before the pipeline could take them
+        self.over_budget = 0      # processed, but finished after the budget
+        self.shed = 0             # processed without the optional work (video output, display)
+        self.behind = False       # the last frame finished over budget
+        self.t0 = time.monotonic()
+
+    def summary(self):
+        lat = np.array(self.latencies) * 1000.0 if self.latencies else np.zeros(1)
+        elapsed = max(1e-6, time.monotonic() - self.t0)
+        return (f"live: {self.processed / elapsed:.1f} fps processed, latency p50 {np.percentile(lat, 50):.0f}ms "
+                f"p95 {np.percentile(lat, 95):.0f}ms max {lat.max():.0f}ms, over budget {self.over_budget}, "
+                f"shed {self.shed}, dropped {self.dropped_reader} (reader)")
+
+def iter_live_frames(reader, latency_budget_sec, stats, report_every_sec=10.0):
+    """
+    Yield (frame_id, time_sec, frame) from a LatestFrameReader, where time_sec is
+    wall-clock seconds since the stream started. Latency is measured when the
+    consumer asks for the next frame, i.e. after detection, rules, alerts and
+    drawing, before waiting for that frame. While the last frame finished over
+    the latency budget, stats.behind is set so the consumer sheds optional work
+    on the next one. The reader is what drops frames: a frame is never older
+    than the budget when it is taken, since only the newest one is kept.
+    """
+    last_seq = 0
+    start = None
+    last_report = time.monotonic()
+    pending = None   # capture time of the frame handed out last
+    try:
+        while True:
+            if pending is not None:
+                latency = time.monotonic() - pending
+                stats.latencies.append(latency)
+                stats.processed += 1
+                stats.behind = latency > latency_budget_sec
+                if stats.behind:
+                    stats.over_budget += 1
+                pending = None
+            item = reader.read(last_seq)
+            if item is None:
+                break
+            seq, t_cap, frame = item
+            stats.dropped_reader += seq - last_seq - 1
+            last_seq = seq
+            if start is None:
+                start = t_cap
+            if stats.behind:
+                stats.shed += 1
+            now = time.monotonic()
+            if now - last_report >= report_every_sec:
+                print(stats.summary())
+                last_report = now
+            pending = t_cap
+            yield seq, t_cap - start, frame
+    finally:
+        reader.stop()
+        print(stats.summary())
@@ -0,0 +1,341 @@
+# src/storage.py
+"""
+Storage manager for outputs/: log rolling, retention and snapshot layout.
+
+    python -m src.storage --roll-days 7 --max-age-days 90 --max-snap-gb 50
+    python -m src.storage --watch 3600 ...      # same, every hour, as a background task
+    python -m src.storage --reshard             # one-off: move old flat snaps/ into snaps/<date>/legacy/
+
+Layout:
+    outputs/alerts/log.csv                       recent alerts (what the pipeline appends to)
+    outputs/alerts/archive.sqlite                older alerts, table `alerts` indexed by time, source and type
+    outputs/snaps/YYYY-MM-DD/<camera>/*.jpg      snapshots sharded by day and camera
+
+Every pass keeps records and snapshot files consistent:
+  - records older than --max-age-days are dropped together with their snapshots
+  - when --max-snap-gb forces deleting snapshots (oldest first), the records stay
+    but their snap_path is cleared
+  - with --orphan-grace-min, snapshots no record points at are deleted, but only
+    when every record path resolves to a file under snaps/
+Record paths are relative to the directory the pipeline ran in, i.e. the parent
+of --outputs, and may use either path separator.
+The live log is rewritten under the same lock file the logger appends with.
+"""
+import argparse
+import csv
+import io
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from src.utils import logger
+from src.utils.locks import FileLock
+
+COLUMN_TYPES = {"video_time_sec": "REAL", "track_id": "INTEGER", "score": "REAL", "frame": "INTEGER"}
+
+ARCHIVE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS alerts ({", ".join(f"{c} {COLUMN_TYPES.get(c, 'TEXT')}" for c in logger.LOG_COLUMNS)});
+-- also what makes rolling the same rows twice (crash before the live log was rewritten) a no-op
+CREATE UNIQUE INDEX IF NOT EXISTS alerts_time ON alerts (timestamp, source_folder, source_video, frame, type, track_id);
+CREATE INDEX IF NOT EXISTS alerts_source ON alerts (source_folder, source_video, timestamp);
+CREATE INDEX IF NOT EXISTS alerts_type ON alerts (type, timestamp);
+"""
+
+def log_path(alert_dir):
+    return os.path.join(alert_dir, "log.csv")
+
+def archive_path(alert_dir):
+    return os.path.join(alert_dir, "archive.sqlite")
+
+def open_archive(alert_dir, create=False):
+    """Connection to the archive database, or None if it doesn't exist and create is False."""
+    path = archive_path(alert_dir)
+    if not create and not os.path.exists(path):
+        return None
+    os.makedirs(alert_dir, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(ARCHIVE_SCHEMA)
+    return conn
+
+def read_rows(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def write_rows(path, rows):
+    """Write rows with the log header to path atomically."""
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=logger.LOG_COLUMNS, extrasaction="ignore", lineterminator="\r\n")
+    w.writeheader()
+    w.writerows(rows)
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, path)
+
+def snap_refs(row):
+    """Snapshot files a record points at (snap_path and crop=... in extra)."""
+    refs = [row["snap_path"]] if row.get("snap_path") else []
+    refs += [x[5:] for x in (row.get("extra") or "").split() if x.startswith("crop=")]
+    return refs
+
+def _root(snap_dir):
+    """Directory record paths are relative to: where the pipeline ran, the parent of the output root."""
+    return os.path.dirname(os.path.dirname(os.path.abspath(snap_dir)))
+
+def _key(path, root=None):
+    """Comparable absolute form of a file path, or of a record path when root is given."""
+    path = path.replace("\\", "/")   # logs written on Windows
+    if root is not None and not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return os.path.normcase(os.path.abspath(path))
+
+def _record_path(path, root, like):
+    """path in the form a record stores it: relative to root unless the old record path `like` was absolute."""
+    return os.path.abspath(path) if os.path.isabs(like.replace("\\", "/")) else os.path.relpath(path, root)
+
+def _next_month(month):
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}"
+
+def _clear_refs(gone, root):
+    """Record rewriter that blanks references to the deleted files in `gone` (a set of _key paths)."""
+    def clear(r):
+        if r["snap_path"] and _key(r["snap_path"], root) in gone:
+            r["snap_path"] = ""
+        r["extra"] = " ".join(x for x in (r.get("extra") or "").split()
+                              if not (x.startswith("crop=") and _key(x[5:], root) in gone))
+        return r
+    return clear
+
+def rewrite_records(fn, alert_dir, live=True, where="1", params=()):
+    """
+    Apply fn(row) -> row or None (drop) to the live log and to the archive rows
+    matching the SQL condition `where`, writing back only what changed. Returns
+    the dropped rows.
+    """
+    dropped = []
+
+    def apply(row):
+        before = dict(row)   # fn may edit row in place
+        row = fn(row)
+        if row is None:
+            dropped.append(before)
+        return row, row != before
+
+    conn = open_archive(alert_dir)
+    if conn is not None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for rec in conn.execute(f"SELECT rowid, * FROM alerts WHERE {where}", params).fetchall():
+                row, changed = apply({c: rec[c] for c in logger.LOG_COLUMNS})
+                if row is None:
+                    conn.execute("DELETE FROM alerts WHERE rowid = ?", (rec["rowid"],))
+                elif changed:
+                    conn.execute(f"UPDATE alerts SET {', '.join(f'{c} = ?' for c in logger.LOG_COLUMNS)} WHERE rowid = ?",
+                                 [row[c] for c in logger.LOG_COLUMNS] + [rec["rowid"]])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    live_path = log_path(alert_dir)
+    if live and os.path.exists(live_path):
+        with FileLock(live_path + ".lock", keepalive=True):
+            rows = read_rows(live_path)
+            out, changed = [], False
+            for r in rows:
+                r, c = apply(r)
+                changed |= c
+                if r is not None:
+                    out.append(r)
+            if changed:
+                write_rows(live_path, out)
+    return dropped
+
+def roll(cutoff, alert_dir):
+    """Move live records older than cutoff ('YYYY-MM-DD HH:MM:SS') into the archive database."""
+    live_path = log_path(alert_dir)
+    if not os.path.exists(live_path):
+        return 0
+    with FileLock(live_path + ".lock", keepalive=True):
+        rows = read_rows(live_path)
+        old = [r for r in rows if r["timestamp"] < cutoff]
+        if not old:
+            return 0
+        conn = open_archive(alert_dir, create=True)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(f"INSERT OR IGNORE INTO alerts VALUES ({', '.join('?' * len(logger.LOG_COLUMNS))})",
+                             [[r.get(c, "") for c in logger.LOG_COLUMNS] for r in old])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        write_rows(live_path, [r for r in rows if r["timestamp"] >= cutoff])
+    return len(old)
+
+def snap_files(snap_dir):
+    """All snapshot files as (day, mtime, size, path), oldest first; flat legacy files use their mtime's day."""
+    out = []
+    for root, _, files in os.walk(snap_dir):
+        rel = os.path.relpath(root, snap_dir).split(os.sep)[0]
+        for name in files:
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            day = rel if len(rel) == 10 and rel[4] == "-" else time.strftime("%Y-%m-%d", time.localtime(st.st_mtime))
+            out.append((day, st.st_mtime, st.st_size, path))
+    out.sort()
+    return out
+
+def remove_files(paths):
+    n = 0
+    for p in paths:
+        try:
+            os.remove(p)
+            n += 1
+        except FileNotFoundError:
+            pass
+    return n
+
+def prune_empty_dirs(root):
+    for d, _, _ in sorted(os.walk(root), key=lambda x: -len(x[0])):
+        if d != root and not os.listdir(d):
+            os.rmdir(d)
+
+def expire(cutoff, alert_dir, snap_dir):
+    """Drop records older than cutoff and every snapshot from before that day."""
+    dropped = rewrite_records(lambda r: r if r["timestamp"] >= cutoff else None, alert_dir,
+                              where="timestamp < ?", params=(cutoff,))
+    day, root = cutoff[:10], _root(snap_dir)
+    old = {_key(p) for d, _, _, p in snap_files(snap_dir) if d < day} | {_key(p, root) for r in dropped for p in snap_refs(r)}
+    n = remove_files(old)
+    # a de-duplicated snapshot can be shared by a slightly newer record
+    rewrite_records(_clear_refs(old, root), alert_dir,
+                    where="timestamp < ?", params=(_next_month(_next_month(cutoff[:7])),))
+    return len(dropped), n
+
+def enforce_size(max_bytes, alert_dir, snap_dir):
+    """Delete the oldest snapshots until they fit in max_bytes; records keep their row with snap_path cleared."""
+    files = snap_files(snap_dir)
+    total = sum(f[2] for f in files)
+    doomed = []
+    for _, _, size, path in files:
+        if total <= max_bytes:
+            break
+        doomed.append(path)
+        total -= size
+    if not doomed:
+        return 0
+    # doomed is a prefix of the day-sorted files, so only records up to a month after them can point at them
+    last = files[len(doomed) - 1][0][:7]
+    rewrite_records(_clear_refs({_key(p) for p in doomed}, _root(snap_dir)), alert_dir,
+                    where="timestamp < ?", params=(_next_month(_next_month(last)),))
+    return remove_files(doomed)
+
+def remove_orphans(grace_sec, alert_dir, snap_dir):
+    """
+    Delete snapshots no record refers to (older than grace_sec, so in-flight
+    alerts are safe). Returns (deleted, unresolved): if any record path does not
+    resolve to a file under snap_dir, the records are not trusted to describe
+    the snapshots and nothing is deleted.
+    """
+    root = _root(snap_dir)
+    refs = set()
+    for r in read_rows(log_path(alert_dir)):
+        refs.update(_key(p, root) for p in snap_refs(r))
+    conn = open_archive(alert_dir)
+    if conn is not None:
+        try:
+            for r in conn.execute("SELECT snap_path, extra FROM alerts WHERE snap_path != '' OR extra LIKE '%crop=%'"):
+                refs.update(_key(p, root) for p in snap_refs(dict(r)))
+        finally:
+            conn.close()
+    inside = _key(snap_dir) + os.sep
+    unresolved = sorted(p for p in refs if not (p.startswith(inside) and os.path.isfile(p)))
+    if unresolved:
+        return 0, unresolved
+    now = time.time()
+    return remove_files([p for _, mtime, _, p in snap_files(snap_dir)
+                         if _key(p) not in refs and now - mtime > grace_sec]), []
+
+def reshard(alert_dir, snap_dir):
+    """Move flat files from the old snaps/ layout into snaps/<date>/legacy/ and update the records."""
+    moved, root = {}, _root(snap_dir)
+    for name in os.listdir(snap_dir) if os.path.isdir(snap_dir) else []:
+        path = os.path.join(snap_dir, name)
+        if not os.path.isfile(path):
+            continue
+        day = time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(path)))
+        new = os.path.join(snap_dir, day, "legacy", name)
+        os.makedirs(os.path.dirname(new), exist_ok=True)
+        shutil.move(path, new)
+        moved[_key(path)] = new
+    if not moved:
+        return 0
+
+    def new_path(old):
+        new = moved.get(_key(old, root))
+        return old if new is None else _record_path(new, root, old)
+
+    def repath(r):
+        if r["snap_path"]:
+            r["snap_path"] = new_path(r["snap_path"])
+        r["extra"] = " ".join("crop=" + new_path(x[5:]) if x.startswith("crop=") else x
+                              for x in (r.get("extra") or "").split())
+        return r
+
+    rewrite_records(repath, alert_dir)
+    return len(moved)
+
+def run_once(args):
+    now = datetime.now()
+    alert_dir, snap_dir = os.path.join(args.outputs, "alerts"), os.path.join(args.outputs, "snaps")
+    if args.reshard:
+        print(f"reshard: moved {reshard(alert_dir, snap_dir)} snapshots into {snap_dir}/<date>/legacy/")
+    if args.roll_days is not None:
+        cutoff = (now - timedelta(days=args.roll_days)).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"roll: archived {roll(cutoff, alert_dir)} records older than {cutoff}")
+    if args.max_age_days is not None:
+        cutoff = (now - timedelta(days=args.max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+        rows, files = expire(cutoff, alert_dir, snap_dir)
+        print(f"retention: dropped {rows} records and {files} snapshots older than {cutoff}")
+    if args.max_snap_gb is not None:
+        n = enforce_size(int(args.max_snap_gb * 1024 ** 3), alert_dir, snap_dir)
+        print(f"retention: deleted {n} snapshots to stay under {args.max_snap_gb} GB")
+    if args.orphan_grace_min is not None:
+        n, unresolved = remove_orphans(args.orphan_grace_min * 60, alert_dir, snap_dir)
+        if unresolved:
+            print(f"orphans: skipped, {len(unresolved)} record paths are not files under {snap_dir} "
+                  f"(e.g. {unresolved[0]}); check --outputs or fix the log first")
+        else:
+            print(f"orphans: deleted {n} unreferenced snapshots")
+    if os.path.isdir(snap_dir):
+        prune_empty_dirs(snap_dir)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--outputs", default="outputs", help="Output root (alerts/ and snaps/ inside)")
+    ap.add_argument("--roll-days", type=float, default=None,
+                    help="Move log.csv records older than this many days into archive.sqlite (default: keep all in log.csv)")
+    ap.add_argument("--max-age-days", type=float, default=None, help="Delete records and snapshots older than this")
+    ap.add_argument("--max-snap-gb", type=float, default=None, help="Keep snapshots under this size, oldest deleted first")
+    ap.add_argument("--orphan-grace-min", type=float, default=None,
+                    help="Delete snapshots no record refers to once they are this many minutes old (default: keep them)")
+    ap.add_argument("--reshard", action="store_true", help="Move flat snaps/*.jpg into the <date>/<camera> layout")
+    ap.add_argument("--watch", type=float, default=0.0, help="Repeat every this many seconds (0 = run once)")
+    args = ap.parse_args()
+
+    while True:
+        run_once(args)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import os
+import glob
 import base64
+import sqlite3
+import numpy as np
 import pandas as pd
 import streamlit as st
 from PIL import Image
 
 # --- Configuration ---
 LOG_PATH = os.path.join("outputs", "alerts", "log.csv")
+ARCHIVE_PATH = os.path.join("outputs", "alerts", "archive.sqlite")  # older alerts, rolled by src.storage
+HEATMAP_DIR = os.path.join("outputs", "heatmaps")
 BASE_PATH = r"D:\Honeywell"  # Base directory prefix for finding images
 
 # --- Page Setup ---
@@ -18,8 +23,15 @@ if not os.path.exists(LOG_PATH):
     st.stop()
 
 # --- Load and Prepare Data ---
+@st.cache_data
+def load_archive(path, mtime):
+    # the archive only changes on storage passes, so cache it by its mtime
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+        return pd.read_sql_query("SELECT * FROM alerts ORDER BY timestamp", conn)
+
 try:
-    df = pd.read_csv(LOG_PATH)
+    frames = [load_archive(ARCHIVE_PATH, os.path.getmtime(ARCHIVE_PATH))] if os.path.exists(ARCHIVE_PATH) else []
+    df = pd.concat(frames + [pd.read_csv(LOG_PATH)], ignore_index=True)
     df["timestamp"] = pd.to_datetime(df["timestamp"])
     df["video_id"] = df["source_folder"].astype(str) + " | " + df["source_video"].astype(str)
     video_options = sorted(df["video_id"].unique().tolist())
@@ -184,6 +196,48 @@ if st.session_state.preview_img_path:
     else:
         st.session_state.preview_img_path = None
 
+@st.cache_data
+def load_heatmap(path, mtime):
+    # mtime is only part of the cache key, so a re-flushed file is reloaded
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
+
+def render_heatmap(grid, background, alpha=0.6):
+    """Blend a log-scaled, colored grid over the stored background frame."""
+    g = np.log1p(grid)
+    g = g / g.max() if g.max() > 0 else g
+    # dark blue -> red -> yellow
+    stops = np.array([[0, 0, 80], [220, 30, 30], [255, 230, 60]], dtype=np.float32)
+    pos = g * (len(stops) - 1)
+    lo = np.clip(np.floor(pos).astype(int), 0, len(stops) - 2)
+    color = stops[lo] + (stops[lo + 1] - stops[lo]) * (pos - lo)[..., None]
+    if background.size:
+        h, w = background.shape[:2]
+        color = np.array(Image.fromarray(color.astype(np.uint8)).resize((w, h), Image.NEAREST), dtype=np.float32)
+        weight = alpha * (g > 0).astype(np.float32)
+        weight = np.array(Image.fromarray((weight * 255).astype(np.uint8)).resize((w, h), Image.NEAREST),
+                          dtype=np.float32)[..., None] / 255.0
+        color = background[..., ::-1] * (1 - weight) + color * weight
+    return color.astype(np.uint8)
+
+def show_heatmaps():
+    files = sorted(glob.glob(os.path.join(HEATMAP_DIR, "*.npz")))
+    if not files:
+        return
+    st.subheader("Camera Heatmaps")
+    names = [os.path.basename(p)[:-4] for p in files]
+    c1, c2, c3 = st.columns(3)
+    cam = c1.selectbox("Camera", names)
+    path = files[names.index(cam)]
+    data = load_heatmap(path, os.path.getmtime(path))
+    labels = [str(l) for l in data["labels"]]
+    label = c2.selectbox("Object", labels)
+    kind = c3.radio("Map", ["dwell", "occupancy"], horizontal=True)
+    grid = data[kind][labels.index(label)]
+    st.image(render_heatmap(grid, data["background"]), use_container_width=True)
+    st.caption(f"{kind} of {label}: {grid.sum() / 60:.1f} object-minutes over {float(data['seconds']) / 60:.1f} "
+               f"minutes of video from {int(data['runs'])} runs, {int(data['cell_px'])} px cells")
+
 # --- Main App Logic ---
 if st.session_state.selected_video is None:
     st.subheader("Available Videos with Alerts")
@@ -191,6 +245,7 @@ if st.session_state.selected_video is None:
         if st.button(f"▶ {vid}", key=vid, use_container_width=True):
             st.session_state.selected_video = vid
             st.rerun()
+    show_heatmaps()
 else:
     # --- Header and Video Switcher ---
     st.subheader("Alert Details")
@@ -0,0 +1,62 @@
+# src/tracking/base.py
+import os
+import yaml
+
+TRACKERS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "trackers"))
+
+# tracker_type (from the YAML) -> Tracker subclass, filled by @register_tracker
+TRACKERS = {}
+
+def register_tracker(*tracker_types):
+    def deco(cls):
+        for t in tracker_types:
+            TRACKERS[t] = cls
+        return cls
+    return deco
+
+class Tracker:
+    """
+    Common interface for tracker backends.
+    update() takes one frame of detections in frame coordinates and returns an
+    (M, 8) array of [x1, y1, x2, y2, track_id, score, cls, det_idx] rows.
+    """
+    def __init__(self, cfg, fps=30):
+        self.cfg = cfg
+        self.fps = fps
+
+    def update(self, xyxy, conf, cls, frame):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def state_dict(self):
+        """Picklable tracker state for checkpoints, or None if this backend can't be restored (re-seeded on resume)."""
+        return None
+
+    def load_state_dict(self, state):
+        raise NotImplementedError
+
+def tracker_cfg_path(name):
+    """Resolve --tracker: a YAML path, or the name of a file in trackers/ (e.g. 'strongsort', 'iou')."""
+    if os.path.isfile(name):
+        return os.path.abspath(name)
+    path = os.path.join(TRACKERS_DIR, name if name.endswith(".yaml") else f"{name}.yaml")
+    if not os.path.exists(path):
+        available = sorted(f[:-5] for f in os.listdir(TRACKERS_DIR) if f.endswith(".yaml"))
+        raise FileNotFoundError(f"Tracker config '{name}' not found (available: {', '.join(available)})")
+    return path
+
+def build_tracker(name_or_path, fps=30):
+    """Instantiate the backend selected by the YAML's tracker_type."""
+    # backends register themselves on import
+    from src.tracking import iou_tracker, ultralytics_tracker  # noqa: F401
+
+    path = tracker_cfg_path(name_or_path)
+    with open(path, "r") as f:
+        cfg = yaml.safe_load(f) or {}
+    cfg["cfg_path"] = path
+    tracker_type = cfg.get("tracker_type")
+    if tracker_type not in TRACKERS:
+        raise ValueError(f"Unsupported tracker_type '{tracker_type}' in {path}")
+    return TRACKERS[tracker_type](cfg, fps=fps)
@@ -0,0 +1,137 @@
+# src/tracking/iou_tracker.py
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from src.tracking.base import Tracker, register_tracker
+
+INVALID = 1e6
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N,4) and (M,4) xyxy boxes."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(np.clip(a[:, 2:] - a[:, :2], 0, None), axis=1)
+    area_b = np.prod(np.clip(b[:, 2:] - b[:, :2], 0, None), axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+@register_tracker("iou")
+class IoUTracker(Tracker):
+    """
+    CPU-only tracker without appearance re-id.
+    Tracks are moved by a constant-velocity guess, matched to detections on an
+    IoU cost matrix (with a centroid-distance fallback for fast or small objects)
+    solved by Hungarian assignment. All per-track state lives in NumPy arrays.
+    Detections of any class can continue a track (a bag flips between backpack
+    and handbag) unless match_class is set; a track takes the class it was last
+    matched with.
+    """
+    STATE_KEYS = ("frame_count", "next_id", "last", "boxes", "vel", "ids", "cls", "hits", "misses")
+
+    def __init__(self, cfg, fps=30):
+        super().__init__(cfg, fps)
+        self.det_thresh = float(cfg.get("det_thresh", 0.1))
+        self.new_track_thresh = float(cfg.get("new_track_thresh", 0.4))
+        self.iou_thresh = float(cfg.get("iou_thresh", 0.3))
+        self.max_centroid_dist = float(cfg.get("max_centroid_dist", 0.5))
+        self.max_age = int(cfg.get("max_age", 30))
+        self.min_hits = int(cfg.get("min_hits", 3))
+        self.alpha = float(cfg.get("velocity_alpha", 0.5))
+        self.max_predict = int(cfg.get("max_predict_frames", 3))
+        self.match_class = bool(cfg.get("match_class", False))
+        self.reset()
+
+    def reset(self):
+        self.frame_count = 0
+        self.next_id = 1
+        self.last = np.zeros((0, 4), np.float32)    # last matched box
+        self.boxes = np.zeros((0, 4), np.float32)   # predicted box for the current frame
+        self.vel = np.zeros((0, 4), np.float32)     # per-frame box velocity
+        self.ids = np.zeros(0, np.int64)
+        self.cls = np.zeros(0, np.int64)
+        self.hits = np.zeros(0, np.int64)
+        self.misses = np.zeros(0, np.int64)         # frames since last match
+
+    def state_dict(self):
+        return {k: getattr(self, k) for k in self.STATE_KEYS}
+
+    def load_state_dict(self, state):
+        for k in self.STATE_KEYS:
+            setattr(self, k, state[k])
+
+    def _cost(self, dets, det_cls):
+        iou = iou_matrix(self.boxes, dets)
+        tc = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2.0
+        dc = (dets[:, :2] + dets[:, 2:]) / 2.0
+        diag = np.hypot(self.boxes[:, 2] - self.boxes[:, 0], self.boxes[:, 3] - self.boxes[:, 1])
+        dist = np.linalg.norm(tc[:, None, :] - dc[None, :, :], axis=2) / np.maximum(diag[:, None], 1.0)
+        valid = (iou >= self.iou_thresh) | (dist <= self.max_centroid_dist)
+        if self.match_class:
+            valid &= self.cls[:, None] == det_cls[None, :]
+        # any overlap beats a pure centroid match
+        cost = np.where(iou > 0, 1.0 - iou, 1.0 + dist)
+        return np.where(valid, cost, INVALID)
+
+    def update(self, xyxy, conf, cls, frame=None):
+        self.frame_count += 1
+        xyxy = np.asarray(xyxy, np.float32).reshape(-1, 4)
+        conf = np.asarray(conf, np.float32).reshape(-1)
+        cls = np.asarray(cls, np.int64).reshape(-1)
+        det_idx = np.flatnonzero(conf >= self.det_thresh)
+        dets, det_conf, det_cls = xyxy[det_idx], conf[det_idx], cls[det_idx]
+
+        # constant-velocity prediction, capped so lost tracks don't drift away
+        steps = np.minimum(self.misses + 1, self.max_predict)[:, None]
+        self.boxes = self.last + self.vel * steps
+
+        matched_t = np.zeros(0, np.int64)
+        matched_d = np.zeros(0, np.int64)
+        if len(self.ids) and len(dets):
+            cost = self._cost(dets, det_cls)
+            rows, cols = linear_sum_assignment(cost)
+            ok = cost[rows, cols] < INVALID
+            matched_t, matched_d = rows[ok], cols[ok]
+
+        # update matched tracks
+        if matched_t.size:
+            new = dets[matched_d]
+            step = (new - self.last[matched_t]) / (self.misses[matched_t, None] + 1)
+            self.vel[matched_t] = self.alpha * self.vel[matched_t] + (1.0 - self.alpha) * step
+            self.last[matched_t] = new
+            self.cls[matched_t] = det_cls[matched_d]
+            self.hits[matched_t] += 1
+        self.misses += 1
+        self.misses[matched_t] = 0
+
+        # start new tracks from confident unmatched detections
+        unmatched = np.setdiff1d(np.arange(len(dets)), matched_d)
+        unmatched = unmatched[det_conf[unmatched] >= self.new_track_thresh]
+        n_new = len(unmatched)
+        if n_new:
+            self.last = np.concatenate([self.last, dets[unmatched]])
+            self.vel = np.concatenate([self.vel, np.zeros((n_new, 4), np.float32)])
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n_new)])
+            self.cls = np.concatenate([self.cls, det_cls[unmatched]])
+            self.hits = np.concatenate([self.hits, np.ones(n_new, np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(n_new, np.int64)])
+            self.next_id += n_new
+
+        # report tracks matched this frame once confirmed (or during start-up)
+        out_t = np.concatenate([matched_t, np.arange(len(self.ids) - n_new, len(self.ids))])
+        out_d = np.concatenate([matched_d, unmatched])
+        confirmed = (self.hits[out_t] >= self.min_hits) | (self.frame_count <= self.min_hits)
+        out_t, out_d = out_t[confirmed], out_d[confirmed]
+        tracks = np.concatenate([
+            self.last[out_t],
+            self.ids[out_t, None].astype(np.float32),
+            det_conf[out_d, None],
+            det_cls[out_d, None].astype(np.float32),
+            det_idx[out_d, None].astype(np.float32),
+        ], axis=1) if out_t.size else np.zeros((0, 8), np.float32)
+
+        # drop tracks lost for too long
+        alive = self.misses <= self.max_age
+        if not alive.all():
+            self.last, self.vel, self.ids = self.last[alive], self.vel[alive], self.ids[alive]
+            self.cls, self.hits, self.misses = self.cls[alive], self.hits[alive], self.misses[alive]
+        return tracks
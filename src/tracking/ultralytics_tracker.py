@@ -0,0 +1,32 @@
+# src/tracking/ultralytics_tracker.py
+import pickle
+
+from src.tracking.base import Tracker, register_tracker
+from src.utils.tracker_utils import init_tracker, update_tracks
+
+@register_tracker("bytetrack", "botsort")
+class UltralyticsTracker(Tracker):
+    """ByteTrack/BoT-SORT from ultralytics, configured by trackers/strongsort.yaml."""
+    def __init__(self, cfg, fps=30):
+        super().__init__(cfg, fps)
+        self.tracker = init_tracker(cfg["cfg_path"], fps)
+
+    def update(self, xyxy, conf, cls, frame):
+        return update_tracks(self.tracker, xyxy, conf, cls, frame)
+
+    def reset(self):
+        self.tracker.reset()
+
+    def state_dict(self):
+        from ultralytics.trackers.basetrack import BaseTrack
+        try:
+            blob = pickle.dumps(self.tracker)
+        except Exception:
+            return None   # e.g. a ReID/GMC component that can't be pickled
+        # track ids come from a class-level counter shared by all trackers
+        return {"tracker": blob, "next_id": BaseTrack._count}
+
+    def load_state_dict(self, state):
+        from ultralytics.trackers.basetrack import BaseTrack
+        self.tracker = pickle.loads(state["tracker"])
+        BaseTrack._count = state["next_id"]
@@ -3,9 +3,10 @@ import os
 import glob
 import cv2
 import numpy as np
-from ultralytics import YOLO
 
-from src.utils.tracker_utils import init_tracker, update_tracks
+from src.detectors.base import build_detector
+from src.detectors.tiling import TiledDetector
+from src.tracking.base import build_tracker
 from src.features import TrackBuffer, trajectory_features
 from src.anomaly_model import IsolationAnomaly
 
@@ -20,8 +21,7 @@ def iter_ucsd_sequence(seq_dir):
             yield img
 
 def main():
-    model = YOLO("yolov8n.pt")
-    trackbuf = TrackBuffer(max_frames=30)
+    model = build_detector("ultralytics", "yolov8n.pt")
     feats = []
 
     base_dir = "data/UCSDped2/Train"
@@ -32,24 +32,26 @@ def main():
     for seq in seq_dirs:
         print(f"Processing {seq} ...")
         frame_id = 0
+        # fresh tracker + history per sequence so track ids never mix across clips
+        tracker = build_tracker("strongsort", fps)
+        trackbuf = TrackBuffer(max_frames=30)
+        detector = None
 
         for frame in iter_ucsd_sequence(seq):
             frame_id += 1
-            # **track() instead of model()**
-            for result in model.track(source=frame, stream=True, tracker="trackers/bytetrack.yaml"):
-                tracked = result.boxes  # now compatible with BYTETracker internally
-
-                # update buffer + extract features
-                if tracked is not None and len(tracked) > 0:
-                    xyxy = tracked.xyxy.cpu().numpy()
-                    ids = tracked.id.cpu().numpy().astype(int)
-                    for i in range(len(xyxy)):
-                        tid = ids[i]
-                        trackbuf.update(tid, xyxy[i], frame_id)
-                        hist = trackbuf.get_history(tid)
-                        if len(hist) >= 6:
-                            feat = trajectory_features(hist, fps=fps)
-                            feats.append(feat)
+            if detector is None:
+                detector = TiledDetector(model, {"imgsz": 640}, (frame.shape[1], frame.shape[0]))
+            xyxy, conf, cls = detector.detect(frame)
+            tracks = tracker.update(xyxy, conf, cls, frame)
+
+            # update buffer + extract features
+            for row in tracks:
+                tid = int(row[4])
+                trackbuf.update(tid, row[:4], frame_id)
+                hist = trackbuf.get_history(tid)
+                if len(hist) >= 6:
+                    feat = trajectory_features(hist, fps=fps)
+                    feats.append(feat)
 
     feats = np.vstack(feats)
     print("Collected features shape:", feats.shape)
@@ -0,0 +1,16 @@
+# src/utils/config.py
+import os
+import yaml
+
+DEFAULT_CAMERA_CFG = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..",
+                                                  "configs", "cameras", "default.yaml"))
+
+def load_camera_config(path=None):
+    """Load a per-camera YAML config (rules, thresholds, ...). Defaults to configs/cameras/default.yaml."""
+    path = path or DEFAULT_CAMERA_CFG
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Camera config not found at {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    cfg.setdefault("camera", os.path.splitext(os.path.basename(path))[0])
+    return cfg
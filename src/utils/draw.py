@@ -4,7 +4,8 @@ COLORS = {
     "person": (40, 180, 40),
     "bag":    (40, 40, 220),
     "bicycle":(220, 180, 40),
-    "alert":  (0, 0, 255)
+    "alert":  (0, 0, 255),
+    "zone":   (200, 200, 0)
 }
 
 def label_for(cls_id:int, names):
@@ -30,3 +31,11 @@ def draw_tracks(frame, tracked, alerts, names):
             cv2.rectangle(frame,(x1,y1),(x2,y2), COLORS["alert"], 2)
             cv2.putText(frame, f"ALERT: {a['type']} {a['label']} #{a['id']}",
                         (x1, max(0,y1-22)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, COLORS["alert"], 2)
+
+def draw_zones(frame, zone_map):
+    if zone_map is None:
+        return
+    for name, pts in zip(zone_map.names[1:], zone_map.polygons):
+        cv2.polylines(frame, [pts], True, COLORS["zone"], 1)
+        cv2.putText(frame, name, tuple(int(v) for v in pts[0]),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLORS["zone"], 1)
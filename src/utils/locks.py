@@ -0,0 +1,50 @@
+# src/utils/locks.py
+import os
+import threading
+import time
+
+class FileLock:
+    """
+    Exclusive lock file (O_EXCL works on shared filesystems too); locks older than
+    `stale_sec` are broken. With keepalive=True the lock file's mtime is refreshed
+    while held, so a long critical section (log rewrites) is never taken for stale.
+    """
+    def __init__(self, path, stale_sec=60.0, keepalive=False):
+        self.path = path
+        self.stale_sec = stale_sec
+        self.keepalive = keepalive
+        self._stop = None
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_sec:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.05)
+        if self.keepalive:
+            self._stop = threading.Event()
+            threading.Thread(target=self._refresh, args=(self._stop,), daemon=True).start()
+        return self
+
+    def _refresh(self, stop):
+        while not stop.wait(self.stale_sec / 4.0):
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass
+
+    def __exit__(self, *exc):
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
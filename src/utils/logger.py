@@ -1,54 +1,66 @@
-import os, cv2, csv, time
+import os, csv
 from datetime import datetime
 
+from src.utils.locks import FileLock
+
 ALERT_DIR = os.path.join("outputs", "alerts")
 SNAP_DIR  = os.path.join("outputs", "snaps")
 LOG_PATH  = os.path.join(ALERT_DIR, "log.csv")
+LOG_COLUMNS = [
+    "timestamp", "video_time_sec", "type", "object_label", "track_id",
+    "score", "frame", "snap_path", "source_video", "source_folder", "extra"
+]
 
-os.makedirs(ALERT_DIR, exist_ok=True)
-os.makedirs(SNAP_DIR,  exist_ok=True)
+def _ensure_log(log_path):
+    """Create the log's directory and CSV header on first use rather than at import."""
+    if not os.path.exists(log_path):
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with open(log_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(LOG_COLUMNS)
 
-# Ensure CSV header includes source info
-if not os.path.exists(LOG_PATH):
-    with open(LOG_PATH, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "timestamp", "video_time_sec", "type", "object_label", "track_id",
-            "score", "frame", "snap_path", "source_video", "source_folder", "extra"
-        ])
+def append_rows(rows, log_path=LOG_PATH):
+    """Append already formatted log rows (lists in LOG_COLUMNS order), e.g. merged shard logs."""
+    _ensure_log(log_path)
+    with FileLock(log_path + ".lock"), open(log_path, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
 
-def log_alert(alert: dict, frame_bgr):
+def log_alerts(alerts, frame_bgr, snapshots=None, log_path=LOG_PATH):
     """
+    Log all alerts raised on one frame: snapshots are written once per frame by
+    `snapshots` (a SnapshotWriter; default full-frame into SNAP_DIR) and the CSV
+    at log_path is opened once.
     alert fields expected:
        type, label, id, score, frame, video_time_sec, xyxy, source_video, source_folder
     """
+    if not alerts:
+        return
+    _ensure_log(log_path)
+    if snapshots is None:
+        from src.utils.snapshots import SnapshotWriter
+        snapshots = SnapshotWriter(SNAP_DIR, dedup=False)
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    fname = f"{alert.get('type')}_{alert.get('label')}_{alert.get('id')}_{int(time.time()*1000)}.jpg"
-    snap_path = os.path.join(SNAP_DIR, fname)
+    snaps = snapshots.write(alerts, frame_bgr)
 
-    # draw bounding box snapshot
-    if frame_bgr is not None and alert.get("xyxy") is not None:
-        x1, y1, x2, y2 = list(map(int, alert["xyxy"]))
-        snap = frame_bgr.copy()
-        cv2.rectangle(snap, (x1, y1), (x2, y2), (0, 0, 255), 2)
-        cv2.putText(snap, f"{alert['type']} {alert['label']}#{alert['id']}",
-                    (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-        cv2.imwrite(snap_path, snap)
-    else:
-        snap_path = ""
-
-    with open(LOG_PATH, "a", newline="", encoding="utf-8") as f:
+    # the lock keeps appends out of the way of src.storage rewriting the log
+    with FileLock(log_path + ".lock"), open(log_path, "a", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        w.writerow([
-            ts,
-            f"{alert.get('video_time_sec', 0):.2f}",
-            alert.get("type", ""),
-            alert.get("label", ""),
-            alert.get("id", ""),
-            f"{alert.get('score', 0):.3f}",
-            alert.get("frame", ""),
-            snap_path,
-            alert.get("source_video", ""),   # <-- NEW
-            alert.get("source_folder", ""),  # <-- NEW
-            alert.get("extra", "")
-        ])
+        for alert, (snap_path, snap_extra) in zip(alerts, snaps):
+            extra = " ".join(x for x in (alert.get("extra", ""), snap_extra) if x)
+            w.writerow([
+                ts,
+                f"{alert.get('video_time_sec', 0):.2f}",
+                alert.get("type", ""),
+                alert.get("label", ""),
+                alert.get("id", ""),
+                f"{alert.get('score', 0):.3f}",
+                alert.get("frame", ""),
+                snap_path,
+                alert.get("source_video", ""),   # <-- NEW
+                alert.get("source_folder", ""),  # <-- NEW
+                extra
+            ])
+
+def log_alert(alert: dict, frame_bgr):
+    """Single-alert form of log_alerts()."""
+    log_alerts([alert], frame_bgr)
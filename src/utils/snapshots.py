@@ -0,0 +1,144 @@
+# src/utils/snapshots.py
+import os
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+def dhash(img):
+    """64-bit difference hash of an image; near-identical images differ in only a few bits."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+class SnapshotWriter:
+    """
+    Frame-level alert snapshots: all alerts of a frame share one annotated copy
+    and one JPEG encode. Optional crop-plus-context snapshots per alert,
+    configurable JPEG quality/downscale, and perceptual-hash de-duplication that
+    reuses an earlier file for the same alerts when the scene has not changed.
+    Files go into <snap_dir>/<YYYY-MM-DD>/<camera>/ so no directory grows without
+    bound and src.storage can expire whole days.
+
+    Camera config:
+        snapshots:
+          mode: frame           # frame | crop | both | none
+          jpeg_quality: 90
+          max_width: 0          # downscale full-frame snapshots wider than this (0 = keep)
+          crop_context: 0.5     # crop = alert box grown by this fraction of its size per side
+          crop_min_size: 96
+          dedup: true
+          dedup_max_distance: 4 # hash bits that may differ for two snapshots to count as the same
+    """
+    def __init__(self, snap_dir, mode="frame", jpeg_quality=90, max_width=0, crop_context=0.5,
+                 crop_min_size=96, dedup=True, dedup_max_distance=4, dedup_history=256, camera="default"):
+        if mode not in ("frame", "crop", "both", "none"):
+            raise ValueError(f"Unknown snapshots.mode '{mode}' (expected frame, crop, both or none)")
+        self.snap_dir = snap_dir
+        self.camera = camera
+        self._shard = (None, None)   # (date, dir) the last snapshot went to
+        self.mode = mode
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.max_width = int(max_width)
+        self.crop_context = float(crop_context)
+        self.crop_min_size = int(crop_min_size)
+        self.dedup = bool(dedup)
+        self.dedup_max_distance = int(dedup_max_distance)
+        self.recent = deque(maxlen=int(dedup_history))   # (key, hash, path) of recently written files
+        self.written = 0
+        self.deduped = 0
+
+    @classmethod
+    def from_config(cls, snap_dir, cfg=None, camera="default"):
+        return cls(snap_dir, camera=camera, **(cfg or {}))
+
+    def _shard_dir(self):
+        date = time.strftime("%Y-%m-%d")
+        if self._shard[0] != date:
+            d = os.path.join(self.snap_dir, date, self.camera)
+            os.makedirs(d, exist_ok=True)
+            self._shard = (date, d)
+        return self._shard[1]
+
+    def _save(self, img, fname, key):
+        """
+        Encode and write img unless a near-identical snapshot of the same alerts
+        (`key`) was written recently; returns the path.
+        """
+        if self.dedup:
+            h = dhash(img)
+            for prev_key, prev, path in self.recent:
+                if prev_key == key and bin(prev ^ h).count("1") <= self.dedup_max_distance:
+                    self.deduped += 1
+                    return path
+        ok, buf = cv2.imencode(".jpg", img, self.params)
+        if not ok:
+            return ""
+        path = os.path.join(self._shard_dir(), fname)
+        with open(path, "wb") as f:
+            f.write(buf.tobytes())
+        self.written += 1
+        if self.dedup:
+            self.recent.append((key, h, path))
+        return path
+
+    def _crop(self, snap, xyxy):
+        """Alert box plus context, or None when the box lies outside the frame."""
+        h, w = snap.shape[:2]
+        x1, y1, x2, y2 = xyxy
+        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+        half_w = max((x2 - x1) * (0.5 + self.crop_context), self.crop_min_size / 2.0)
+        half_h = max((y2 - y1) * (0.5 + self.crop_context), self.crop_min_size / 2.0)
+        crop = snap[max(0, int(cy - half_h)):min(h, int(cy + half_h)),
+                    max(0, int(cx - half_w)):min(w, int(cx + half_w))]
+        return crop if crop.size else None
+
+    def write(self, alerts, frame_bgr):
+        """
+        Returns, for each alert, (snap_path, extra) where extra is text to append
+        to the alert's extra column ("" if none).
+        """
+        boxed = [a for a in alerts if a.get("xyxy") is not None]
+        if self.mode == "none" or frame_bgr is None or not boxed:
+            return [("", "")] * len(alerts)
+
+        # one annotated copy for every alert on this frame
+        snap = frame_bgr.copy()
+        for a in boxed:
+            x1, y1, x2, y2 = list(map(int, a["xyxy"]))
+            cv2.rectangle(snap, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(snap, f"{a['type']} {a['label']}#{a['id']}",
+                        (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
+        ms = int(time.time() * 1000)
+        first = boxed[0]
+        stem = f"{first.get('type')}_{first.get('label')}_{first.get('id')}_{ms}"
+        frame_path = ""
+        if self.mode in ("frame", "both"):
+            full = snap
+            if self.max_width and snap.shape[1] > self.max_width:
+                scale = self.max_width / snap.shape[1]
+                full = cv2.resize(snap, (self.max_width, int(round(snap.shape[0] * scale))),
+                                  interpolation=cv2.INTER_AREA)
+            frame_path = self._save(full, stem + ".jpg",
+                                    tuple(sorted((a.get("type"), a.get("id")) for a in boxed)))
+
+        out = []
+        for a in alerts:
+            if a.get("xyxy") is None:
+                out.append(("", ""))
+                continue
+            crop_path = ""
+            if self.mode in ("crop", "both"):
+                crop = self._crop(snap, a["xyxy"])
+                if crop is None and self.mode == "crop":
+                    crop = snap   # nothing to crop: keep the full frame rather than no snapshot
+                if crop is not None:
+                    crop_path = self._save(crop, f"{a.get('type')}_{a.get('label')}_{a.get('id')}_{ms}_crop.jpg",
+                                           (a.get("type"), a.get("id")))
+            if self.mode == "crop":
+                out.append((crop_path, ""))
+            else:
+                out.append((frame_path, f"crop={crop_path}" if crop_path else ""))
+        return out
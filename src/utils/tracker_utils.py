@@ -1,40 +1,39 @@
 # src/utils/tracker_utils.py
 import os
 import yaml
-from types import SimpleNamespace
-from ultralytics.trackers.byte_tracker import BYTETracker
 import numpy as np
 
-def dict_to_namespace(d):
-    if isinstance(d, dict):
-        return SimpleNamespace(**{k: dict_to_namespace(v) for k, v in d.items()})
-    elif isinstance(d, list):
-        return [dict_to_namespace(x) for x in d]
-    else:
-        return d
+DEFAULT_TRACKER_CFG = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..",
+                                                   "trackers", "strongsort.yaml"))
 
-def init_tracker():
-    cfg_path = os.path.join(os.path.dirname(__file__), "..", "..", "trackers", "bytetrack.yaml")
-    cfg_path = os.path.abspath(cfg_path)
+def init_tracker(cfg_path=None, fps=30):
+    """Build an ultralytics tracker (tracker_type from the YAML) that we feed detections ourselves."""
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.trackers.track import TRACKER_MAP
 
+    cfg_path = os.path.abspath(cfg_path or DEFAULT_TRACKER_CFG)
     if not os.path.exists(cfg_path):
-        raise FileNotFoundError(f"ByteTrack config not found at {cfg_path}")
+        raise FileNotFoundError(f"Tracker config not found at {cfg_path}")
 
     with open(cfg_path, "r") as f:
-        args_dict = yaml.safe_load(f)
-    args = dict_to_namespace(args_dict)
-
-    return BYTETracker(args)
-
-def update_tracks(tracker, detections):
-    """Convert detections to BYTETracker expected format"""
-    if not detections or len(detections) == 0:
-        return []
-
-    # detections: [[x1, y1, x2, y2, conf], ...]
-    dets_for_tracker = []
-    for det in detections:
-        x1, y1, x2, y2, conf = det
-        dets_for_tracker.append(SimpleNamespace(xyxy=np.array([x1, y1, x2, y2]), conf=conf))
-
-    return tracker.update(dets_for_tracker)
+        args = IterableSimpleNamespace(**yaml.safe_load(f))
+    if args.tracker_type not in TRACKER_MAP:
+        raise ValueError(f"Unsupported tracker_type '{args.tracker_type}' in {cfg_path}")
+    try:
+        return TRACKER_MAP[args.tracker_type](args=args, frame_rate=int(round(fps)))
+    except TypeError:
+        # newer ultralytics trackers no longer take frame_rate
+        return TRACKER_MAP[args.tracker_type](args=args)
+
+def update_tracks(tracker, xyxy, conf, cls, frame):
+    """
+    Feed one frame of merged detections to the tracker.
+    Returns an (M, 8) array of [x1, y1, x2, y2, track_id, score, cls, det_idx].
+    """
+    from ultralytics.engine.results import Boxes
+
+    data = np.concatenate([np.asarray(xyxy, np.float32).reshape(-1, 4),
+                           np.asarray(conf, np.float32).reshape(-1, 1),
+                           np.asarray(cls, np.float32).reshape(-1, 1)], axis=1)
+    tracks = tracker.update(Boxes(data, frame.shape[:2]), frame)
+    return np.asarray(tracks, dtype=np.float32).reshape(-1, 8) if len(tracks) else np.zeros((0, 8), np.float32)
@@ -0,0 +1,53 @@
+# src/utils/zones.py
+import cv2
+import numpy as np
+
+class ZoneMap:
+    """
+    Polygon zones rasterized once into a label mask at frame resolution.
+    Mask value 0 means "no zone"; zone k (1-based, config order) owns value k.
+    Where polygons overlap, the zone listed later wins.
+
+    Config (per camera):
+        zones:
+          doorway:  {polygon: [[x, y], ...]}
+          platform: {polygon: [[0.1, 0.5], ...], normalized: true}
+    """
+    def __init__(self, zones, frame_size):
+        width, height = int(frame_size[0]), int(frame_size[1])
+        if len(zones) > 255:
+            raise ValueError("At most 255 zones per camera are supported")
+        self.width, self.height = width, height
+        self.names = [None]          # index 0 = outside every zone
+        self.polygons = []
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+
+        for zid, (name, spec) in enumerate(zones.items(), start=1):
+            spec = spec if isinstance(spec, dict) else {"polygon": spec}
+            pts = np.asarray(spec.get("polygon") or [], dtype=np.float64).reshape(-1, 2)
+            if len(pts) < 3:
+                raise ValueError(f"Zone '{name}' needs a polygon with at least 3 points")
+            if spec.get("normalized"):
+                pts = pts * np.array([width, height], dtype=np.float64)
+            pts = np.round(pts).astype(np.int32)
+            cv2.fillPoly(self.mask, [pts], zid)
+            self.names.append(str(name))
+            self.polygons.append(pts)
+
+    def __len__(self):
+        return len(self.names) - 1
+
+    def zone_id(self, name):
+        try:
+            return self.names.index(name, 1)
+        except ValueError:
+            raise ValueError(f"Unknown zone '{name}' (defined: {', '.join(self.names[1:]) or 'none'})")
+
+    def lookup(self, points):
+        """Zone id for every (x, y) point in one vectorized mask index."""
+        points = np.asarray(points)
+        if points.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        xs = np.clip(points[:, 0].astype(np.int64), 0, self.width - 1)
+        ys = np.clip(points[:, 1].astype(np.int64), 0, self.height - 1)
+        return self.mask[ys, xs].astype(np.int64)
@@ -0,0 +1,127 @@
+# src/worker.py
+"""
+Persistent worker: load (and warm up) the model once, then process jobs from a
+local spool-directory queue until stopped.
+
+    python -m src.worker --queue jobs --model yolov8m.onnx --tracker iou
+    python -m src.worker --queue jobs --submit data/av2.avi data/av3.avi
+
+Queue layout (jobs move between dirs with atomic renames, so several workers on
+one host can share a queue):
+    jobs/inbox/    *.json waiting   {"video": ..., "folder": ..., "camera_config": ..., "tracker": ..., "save": ...}
+    jobs/running/  claimed by a worker
+    jobs/done/     finished
+    jobs/failed/   raised an error (the error text is added to the job file)
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import time
+import traceback
+import uuid
+
+from src.detect_anomalies import build_parser, load_model, resolve_backend, run_job
+
+QUEUE_DIRS = ("inbox", "running", "done", "failed")
+# job keys a worker accepts, mapped onto detect_anomalies args
+JOB_KEYS = ("video", "folder", "camera_config", "tracker", "conf", "save", "resume")
+
+def init_queue(queue):
+    for d in QUEUE_DIRS:
+        os.makedirs(os.path.join(queue, d), exist_ok=True)
+
+def submit(queue, job):
+    """Write a job atomically into inbox/ (tmp file + rename) so workers never see partial JSON."""
+    init_queue(queue)
+    name = f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}.json"
+    tmp = os.path.join(queue, name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp, os.path.join(queue, "inbox", name))
+    return name
+
+def claim(queue):
+    """Move the oldest inbox job to running/; returns its path or None. Losing a rename race is fine."""
+    for path in sorted(glob.glob(os.path.join(queue, "inbox", "*.json"))):
+        dst = os.path.join(queue, "running", os.path.basename(path))
+        try:
+            os.rename(path, dst)
+        except OSError:
+            continue
+        return dst
+    return None
+
+def finish(queue, path, job, status, error=None):
+    if error:
+        job["error"] = error
+    job["finished_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(job, f, indent=1)
+    os.replace(path, os.path.join(queue, status, os.path.basename(path)))
+
+def job_args(base_args, job):
+    args = copy.copy(base_args)
+    for key in JOB_KEYS:
+        if key in job:
+            setattr(args, key, job[key])
+    return args
+
+def serve(queue, base_args, poll_sec=1.0, exit_when_empty=False):
+    init_queue(queue)
+    model = load_model(base_args)
+    n = 0
+    while True:
+        path = claim(queue)
+        if path is None:
+            if exit_when_empty:
+                break
+            time.sleep(poll_sec)
+            continue
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        try:
+            job = json.loads(text)
+            if not isinstance(job, dict):
+                raise ValueError(f"job must be a JSON object, got {type(job).__name__}")
+        except ValueError:
+            # keep the broken file's text so it can be inspected in failed/
+            finish(queue, path, {"raw": text}, "failed", traceback.format_exc())
+            print(f"Job {os.path.basename(path)}: unreadable job file, moved to failed/")
+            continue
+        t0 = time.perf_counter()
+        print(f"Job {os.path.basename(path)}: {job.get('video') or job.get('folder')}")
+        try:
+            run_job(model, job_args(base_args, job))
+        except Exception:
+            finish(queue, path, job, "failed", traceback.format_exc())
+            print(f"  failed after {time.perf_counter() - t0:.1f}s")
+        else:
+            finish(queue, path, job, "done")
+            print(f"  done in {time.perf_counter() - t0:.1f}s")
+        n += 1
+    print(f"Queue empty, processed {n} jobs")
+
+def main():
+    ap = build_parser()
+    ap.description = __doc__
+    ap.formatter_class = argparse.RawDescriptionHelpFormatter
+    ap.add_argument("--queue", default=os.path.join("outputs", "queue"), help="Spool directory")
+    ap.add_argument("--submit", nargs="+", metavar="PATH",
+                    help="Enqueue these videos (or folders) with the given --tracker/--camera-config/--conf and exit")
+    ap.add_argument("--poll", type=float, default=1.0, help="Seconds between inbox checks when idle")
+    ap.add_argument("--exit-when-empty", action="store_true")
+    args = ap.parse_args()
+    resolve_backend(args)
+
+    if args.submit:
+        for p in args.submit:
+            job = {"folder" if os.path.isdir(p) else "video": p, "tracker": args.tracker,
+                   "camera_config": args.camera_config, "conf": args.conf, "save": args.save}
+            print("Queued", submit(args.queue, job))
+        return
+    serve(args.queue, args, args.poll, args.exit_when_empty)
+
+if __name__ == "__main__":
+    main()
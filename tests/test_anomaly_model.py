@@ -0,0 +1,45 @@
+import multiprocessing as mp
+
+import numpy as np
+
+from src.anomaly_model import HalfSpaceTrees
+
+WINDOW = 50
+
+def learn_and_save(model_file, seed, n_batches, batch):
+    model = HalfSpaceTrees(model_file=model_file, n_trees=5, depth=4, window_size=WINDOW)
+    model.load()
+    rng = np.random.default_rng(seed)
+    for _ in range(n_batches):
+        model.learn(rng.normal(5.0, 1.0, size=(batch, 3)).clip(0))
+        model.save()
+
+def test_concurrent_saves_merge_instead_of_overwriting(tmp_path):
+    model_file = tmp_path / "hst_cam.npz"
+    base = HalfSpaceTrees(model_file=model_file, n_trees=5, depth=4, window_size=WINDOW)
+    base.learn(np.random.default_rng(0).normal(5.0, 1.0, size=(2 * WINDOW, 3)).clip(0))
+    base.save()
+
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=learn_and_save, args=(str(model_file), seed, 10, 17)) for seed in (1, 2, 3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    merged = HalfSpaceTrees(model_file=model_file)
+    merged.load()
+    # every sample learned by every process is accounted for
+    assert merged.windows * WINDOW + merged.seen == 2 * WINDOW + 3 * 10 * 17
+    assert list(tmp_path.iterdir()) == [model_file]
+    # outliers still score well above the normal data
+    normal = merged.score_samples(np.full((1, 3), 5.0))
+    outlier = merged.score_samples(np.full((1, 3), 60.0))
+    assert outlier[0] > normal[0]
+
+def test_save_before_first_window_writes_nothing(tmp_path):
+    model = HalfSpaceTrees(model_file=tmp_path / "models" / "hst_cam.npz", window_size=WINDOW)
+    model.learn(np.ones((WINDOW - 1, 3)))
+    model.save()
+    assert not (tmp_path / "models").exists()
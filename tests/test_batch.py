@@ -0,0 +1,74 @@
+import csv
+import os
+
+import pytest
+
+from src import batch
+from src.utils import logger
+
+def make_done_job(conn, tmp_path, video="cam1.avi", n_alerts=3):
+    """A finished job whose shard holds n_alerts rows, each with a snapshot in the <date>/<camera>/ layout."""
+    cur = conn.execute("INSERT INTO jobs (video, folder, warmup_frame, start_frame, status) VALUES (?, 'cams', 0, 0, 'done')",
+                       (video,))
+    shard = tmp_path / "shards" / f"job{cur.lastrowid:05d}_a1"
+    snaps = shard / "snaps" / "2026-01-02" / "cam1"
+    snaps.mkdir(parents=True)
+    rows = []
+    for i in range(n_alerts):
+        snap = snaps / f"LOITERING_person_{i}.jpg"
+        snap.write_bytes(b"jpg")
+        rows.append(["2026-01-02 10:00:00", f"{i}.00", "LOITERING", "person", i, "1.000", 10 * i + 1,
+                     str(snap), video, "cams", ""])
+    logger.append_rows(rows, str(shard / "alerts" / "log.csv"))
+    conn.execute("UPDATE jobs SET shard = ? WHERE id = ?", (str(shard), cur.lastrowid))
+    return cur.lastrowid
+
+def read_log(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+@pytest.fixture
+def conn(tmp_path):
+    return batch.connect(str(tmp_path / "jobs.db"))
+
+def test_merge_is_idempotent(conn, tmp_path):
+    log_path, snap_dir = str(tmp_path / "out" / "log.csv"), str(tmp_path / "out" / "snaps")
+    make_done_job(conn, tmp_path)
+    make_done_job(conn, tmp_path, video="cam2.avi", n_alerts=2)
+
+    batch.merge(conn, log_path, snap_dir)
+    rows = read_log(log_path)
+    assert len(rows) == 5
+    assert all(r["snap_path"].startswith(os.path.join(snap_dir, "2026-01-02", "cam1")) for r in rows)
+    assert all(os.path.exists(r["snap_path"]) for r in rows)
+
+    batch.merge(conn, log_path, snap_dir)
+    assert read_log(log_path) == rows
+
+    # crash after appending but before marking the shard merged: the rerun must not duplicate rows
+    conn.execute("UPDATE jobs SET merged = 0")
+    batch.merge(conn, log_path, snap_dir)
+    assert read_log(log_path) == rows
+
+def test_lease_expiry_hands_job_to_another_worker(conn):
+    conn.execute("INSERT INTO jobs (video, folder, warmup_frame, start_frame) VALUES ('v.avi', 'f', 0, 0)")
+    first = batch.claim(conn, "a", lease_sec=60)
+    assert batch.claim(conn, "b", lease_sec=60) is None
+    conn.execute("UPDATE jobs SET lease_until = 0")
+    second = batch.claim(conn, "b", lease_sec=60)
+    assert second["id"] == first["id"] and second["attempts"] == 2
+    # the first worker's late result is discarded
+    assert not batch.finish(conn, first, "a", "done", shard="x")
+    assert batch.finish(conn, second, "b", "done", shard="y")
+
+def test_interrupted_job_is_released(conn, tmp_path, monkeypatch):
+    conn.execute("INSERT INTO jobs (video, folder, warmup_frame, start_frame) VALUES ('v.avi', 'f', 0, 0)")
+    monkeypatch.setattr(batch, "load_model", lambda args: None)
+
+    def interrupted(*a):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(batch, "run_chunk", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        batch.work(str(tmp_path / "jobs.db"), None, lease_sec=60, poll_sec=0, exit_when_empty=True)
+    job = conn.execute("SELECT * FROM jobs").fetchone()
+    assert (job["status"], job["attempts"], job["lease_until"], job["worker"]) == ("pending", 0, None, None)
@@ -0,0 +1,121 @@
+import csv
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+import yaml
+
+from src import detect_anomalies as da
+from src.checkpoint import Checkpointer
+
+N_FRAMES = 120
+FPS = 15
+
+class Crash(Exception):
+    pass
+
+class FakeDetector:
+    """Boxes are a function of the frame index, which is encoded as the frame's gray level."""
+    names = {0: "person", 24: "backpack"}
+
+    def __init__(self, crash_at=None):
+        self.crash_at = crash_at
+        self.calls = 0
+
+    def predict(self, images, imgsz, conf=0.25, iou=0.5):
+        self.calls += 1
+        if self.calls == self.crash_at:
+            raise Crash()
+        out = []
+        for img in images:
+            k = int(round(img.mean() / 2.0))
+            px = 10 + 4 * k   # a person walking away from a bag, and one standing still
+            out.append(np.array([[px, 20, px + 20, 70, 0.9, 0],
+                                 [40, 80, 55, 95, 0.9, 24],
+                                 [200, 20, 220, 70, 0.9, 0]], np.float32))
+        return out
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    video = tmp_path / "cam" / "clip.avi"
+    video.parent.mkdir()
+    w = cv2.VideoWriter(str(video), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (640, 120))
+    for i in range(1, N_FRAMES + 1):
+        w.write(np.full((120, 640, 3), 2 * i, np.uint8))
+    w.release()
+    cfg = tmp_path / "cam.yaml"
+    cfg.write_text(yaml.safe_dump({
+        "camera": "cam",
+        "detection": {"mode": "full", "imgsz": 64},
+        "snapshots": {"mode": "none"},
+        "rules": {"loitering": {"window_sec": 1, "min_disp_px": 10},
+                  "abandonment": {"window_sec": 1, "bag_stationary_px": 10, "unattended_sec": 1, "near_px": 60}},
+    }))
+    # checkpoint every 25 frames instead of every N seconds, so the crash falls between checkpoints
+    calls = {"n": 0}
+
+    def due(self):
+        calls["n"] += 1
+        return calls["n"] % 25 == 0
+    monkeypatch.setattr(Checkpointer, "due", due)
+    return str(video), str(cfg)
+
+def run(video, cfg, detector, resume=False):
+    argv = ["--video", video, "--camera-config", cfg, "--tracker", "iou", "--checkpoint-sec", "1"]
+    args = da.build_parser().parse_args(argv + (["--resume"] if resume else []))
+    try:
+        da.run_job(detector, args)
+    except Crash:
+        return False
+    return True
+
+def logged():
+    path = os.path.join("outputs", "alerts", "log.csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(r["type"], r["track_id"], r["frame"]) for r in csv.DictReader(f)]
+
+def test_resume_repeats_no_alerts_and_misses_none(setup):
+    video, cfg = setup
+    assert run(video, cfg, FakeDetector())
+    expected = logged()
+    assert {t for t, _, _ in expected} == {"LOITERING", "ABANDONED_BAG"}
+    os.remove(Checkpointer("single_video_clip", source=video).path)
+    time.sleep(1.1)   # log timestamps have 1 s resolution; keep the baseline rows out of the next run's
+
+    assert not run(video, cfg, FakeDetector(crash_at=112))
+    assert run(video, cfg, FakeDetector(), resume=True)
+    assert logged()[len(expected):] == expected
+
+    # a finished video is skipped on the next --resume
+    detector = FakeDetector()
+    assert run(video, cfg, detector, resume=True)
+    assert detector.calls == 0 and logged()[len(expected):] == expected
+
+def heatmap_seconds():
+    with np.load(os.path.join("outputs", "heatmaps", "cam.npz")) as f:
+        return float(f["seconds"])
+
+def test_resume_accumulates_each_frame_once(setup):
+    video, cfg = setup
+    with open(cfg) as f:
+        camera = yaml.safe_load(f)
+    camera["heatmaps"] = {"enabled": True, "save_every_sec": 0}   # would flush on every frame
+    with open(cfg, "w") as f:
+        yaml.safe_dump(camera, f)
+    assert run(video, cfg, FakeDetector())
+    expected = heatmap_seconds()
+    os.remove(os.path.join("outputs", "heatmaps", "cam.npz"))
+    os.remove(Checkpointer("single_video_clip", source=video).path)
+
+    assert not run(video, cfg, FakeDetector(crash_at=112))
+    assert run(video, cfg, FakeDetector(), resume=True)
+    # the resumed run only lacks the step from the checkpoint frame to the one after it
+    assert expected - 1.0 / FPS - 1e-6 <= heatmap_seconds() <= expected
+
+def test_same_basename_in_other_folder_gets_its_own_checkpoint(tmp_path):
+    a = Checkpointer("single_video_clip", source=str(tmp_path / "a" / "clip.avi"))
+    b = Checkpointer("single_video_clip", source=str(tmp_path / "b" / "clip.avi"))
+    assert a.path != b.path
@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.tracking.iou_tracker import IoUTracker
+
+def track(tracker, frames):
+    """Run the tracker over per-frame lists of (box, cls); returns the reported ids of each frame."""
+    ids = []
+    for dets in frames:
+        xyxy = np.array([box for box, _ in dets], np.float32).reshape(-1, 4)
+        cls = np.array([c for _, c in dets], np.int64)
+        out = tracker.update(xyxy, np.full(len(dets), 0.9, np.float32), cls)
+        ids.append(sorted(int(i) for i in out[:, 4]))
+    return ids
+
+def test_class_flip_keeps_the_track():
+    bag = [100, 100, 140, 140]
+    frames = [[(bag, 24)]] * 5 + [[(bag, 26)]] + [[(bag, 24)]] * 2
+    assert track(IoUTracker({"min_hits": 1}), frames) == [[1]] * 8
+
+def test_match_class_gates_on_the_last_class():
+    bag = [100, 100, 140, 140]
+    frames = [[(bag, 24)]] * 3 + [[(bag, 26)]] * 2
+    assert track(IoUTracker({"min_hits": 1, "match_class": True}), frames) == [[1]] * 3 + [[2]] * 2
+
+def test_ids_survive_motion_and_missed_frames():
+    frames = []
+    for k in range(20):
+        walker = ([20 + 6 * k, 50, 60 + 6 * k, 130], 0)
+        still = ([300, 50, 340, 130], 0)
+        frames.append([still] if k in (8, 9) else [walker, still])   # the walker is missed twice
+    ids = track(IoUTracker({"min_hits": 1}), frames)
+    assert ids[:8] == [[1, 2]] * 8 and ids[8:10] == [[2]] * 2 and ids[10:] == [[1, 2]] * 10
+
+def test_crossing_objects_keep_their_ids():
+    tracker = IoUTracker({"min_hits": 1})
+    seen = []
+    for k in range(30):
+        a, b = 20 + 8 * k, 260 - 8 * k   # pass each other around k = 15
+        out = tracker.update(np.array([[a, 50, a + 30, 110], [b, 50, b + 30, 110]], np.float32),
+                             np.array([0.9, 0.9], np.float32), np.array([0, 0]))
+        seen.append({int(row[4]): int(row[7]) for row in out})   # id -> detection index
+    assert all(s == {1: 0, 2: 1} for s in seen)
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+from onnx import TensorProto, helper
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def tiny_yolo_onnx(path):
+    """64x64 input -> (1, 6, 64) output shaped like a 2-class YOLOv8 head (4 box rows + 2 class rows)."""
+    graph = helper.make_graph(
+        [helper.make_node("AveragePool", ["images"], ["pooled"], kernel_shape=[8, 8], strides=[8, 8]),
+         helper.make_node("Reshape", ["pooled", "shape"], ["flat"]),
+         helper.make_node("Concat", ["flat", "flat"], ["output0"], axis=1)],
+        "tiny",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, 64, 64])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [1, 6, 64])],
+        [helper.make_tensor("shape", TensorProto.INT64, [3], [1, 3, 64])])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    helper.set_model_props(model, {"names": "{0: 'person', 1: 'bag'}", "stride": "32"})
+    onnx.save(model, str(path))
+    return str(path)
+
+def test_onnx_with_default_tracker_never_imports_torch(tmp_path):
+    model = tiny_yolo_onnx(tmp_path / "tiny.onnx")
+    script = f"""
+import sys
+import numpy as np
+from src.detect_anomalies import build_parser, get_tracker_cfg, load_model
+from src.tracking.base import build_tracker
+
+args = build_parser().parse_args(["--video", "x.avi", "--model", {model!r}])
+detector = load_model(args)
+tracker = build_tracker(get_tracker_cfg(args.tracker), 30)
+frame = np.full((64, 64, 3), 128, np.uint8)
+det = detector.predict([frame], 64, conf=0.01)[0]
+tracker.update(det[:, :4], det[:, 4], det[:, 5], frame)
+assert args.tracker == "iou", args.tracker
+assert "torch" not in sys.modules and "ultralytics" not in sys.modules
+"""
+    out = subprocess.run([sys.executable, "-c", script], cwd=REPO, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+
+def test_onnx_options_rejected_for_ultralytics_backend():
+    from src.detect_anomalies import build_parser, resolve_backend
+
+    args = build_parser().parse_args(["--model", "yolov8m.pt", "--int8", "--threads", "4"])
+    with pytest.raises(ValueError, match="--threads, --int8"):
+        resolve_backend(args)
+    args = build_parser().parse_args(["--model", "yolov8m.pt"])
+    resolve_backend(args)
+    assert (args.backend, args.tracker) == ("ultralytics", "strongsort")
@@ -0,0 +1,15 @@
+from src.output import VideoOutput
+
+def test_clip_ring_is_capped_in_bytes(tmp_path):
+    out = VideoOutput("cam", 30.0, (3840, 2160), {"mode": "clips", "clip_pre_sec": 5}, out_dir=str(tmp_path))
+    try:
+        assert out.ring.maxlen * 3840 * 2160 * 3 <= 512 * 1024 ** 2
+    finally:
+        out.close()
+
+    small = VideoOutput("cam", 30.0, (3840, 2160), {"mode": "clips", "clip_pre_sec": 5, "max_width": 640},
+                        out_dir=str(tmp_path))
+    try:
+        assert small.ring.maxlen == 5 * 30 + 1
+    finally:
+        small.close()
@@ -0,0 +1,75 @@
+import numpy as np
+
+from src.rules.engine import RuleEngine, TrackHistory
+from src.utils.zones import ZoneMap
+
+FPS = 8   # frame times k / 8 are exact in binary, so window edges are not decided by rounding
+
+def person(tid, cx, cy):
+    return {"id": tid, "label": "person", "xyxy": [cx - 10, cy - 20, cx + 10, cy + 20]}
+
+def bag(tid, cx, cy):
+    return {"id": tid, "label": "bag", "xyxy": [cx - 8, cy - 8, cx + 8, cy + 8]}
+
+def run(cfg, frames, frame_size=(200, 100)):
+    """Feed per-frame tracked lists at FPS; returns {frame index: alerts} for frames that raised any."""
+    engine = RuleEngine.from_config(cfg, FPS, frame_size)
+    out = {}
+    for k, tracked in enumerate(frames):
+        alerts = engine.update(tracked, k, k / FPS)
+        if alerts:
+            out[k] = alerts
+    return out
+
+def test_history_windows_are_in_seconds():
+    h = TrackHistory(8)
+    ids = np.array([7])
+    for k in range(12):   # longer than the ring, with a gap of dropped frames
+        if k not in (4, 5, 6):
+            h.push(ids, np.array([[k * 2.0, 0.0]]), k / FPS)
+    disp, span, count = h.displacement(ids, 0.5, 11 / FPS)
+    # frames 8..11 are inside the 0.5 s window; frame 7 is exactly 0.5 s old, so not strictly newer
+    assert count[0] == 4 and span[0] == 3 / FPS and disp[0] == 6.0
+
+def test_loitering_fires_at_a_full_window_and_not_before():
+    cfg = {"rules": {"loitering": {"window_sec": 2, "min_disp_px": 10}}}
+    alerts = run(cfg, [[person(1, 50, 50)]] * 60)
+    # 16 frames at 8 fps cover the 2 s window; then de-duplicated for 3 s
+    assert sorted(alerts) == [15, 40]
+    assert alerts[15][0]["type"] == "LOITERING" and alerts[15][0]["id"] == 1
+
+def test_walking_person_does_not_loiter():
+    cfg = {"rules": {"loitering": {"window_sec": 2, "min_disp_px": 10}}}
+    assert run(cfg, [[person(1, 20 + k, 50)] for k in range(60)]) == {}
+
+def test_abandonment_waits_for_unattended_sec_after_the_owner_leaves():
+    cfg = {"rules": {"abandonment": {"window_sec": 1, "bag_stationary_px": 5, "unattended_sec": 3, "near_px": 40}}}
+    frames = [[bag(1, 100, 50), person(2, 110, 50) if k <= 8 else person(2, 190, 50)] for k in range(100)]
+    alerts = run(cfg, frames)
+    # owner last near at 1.0 s, so the bag is unattended from 4.0 s; de-duplicated for 5 s
+    assert sorted(alerts) == [32, 73]
+    assert alerts[32][0]["type"] == "ABANDONED_BAG" and alerts[32][0]["id"] == 1
+
+def test_attended_bag_is_not_abandoned():
+    cfg = {"rules": {"abandonment": {"window_sec": 1, "bag_stationary_px": 5, "unattended_sec": 3, "near_px": 40}}}
+    assert run(cfg, [[bag(1, 100, 50), person(2, 110, 50)]] * 100) == {}
+
+ZONES = {"door": {"polygon": [[0, 0], [100, 0], [100, 100], [0, 100]]}}
+
+def test_zone_params_override_the_rule_window():
+    cfg = {"zones": ZONES,
+           "rules": {"loitering": {"window_sec": 3, "min_disp_px": 10, "zone_params": {"door": {"window_sec": 1}}}}}
+    alerts = run(cfg, [[person(1, 50, 50), person(2, 150, 50)]] * 25)
+    assert sorted(alerts) == [7, 23]
+    assert [(a["id"], a.get("extra")) for a in alerts[7]] == [(1, "zone=door")]
+    assert [a["id"] for a in alerts[23]] == [2]
+
+def test_zone_scoped_rule_ignores_objects_outside():
+    cfg = {"zones": ZONES, "rules": {"loitering": {"window_sec": 1, "min_disp_px": 10, "zones": ["door"]}}}
+    alerts = run(cfg, [[person(1, 50, 50), person(2, 150, 50)]] * 20)
+    assert {a["id"] for found in alerts.values() for a in found} == {1}
+
+def test_later_zone_wins_where_polygons_overlap():
+    zones = ZoneMap({"a": [[0, 0], [60, 0], [60, 60], [0, 60]],
+                     "b": {"polygon": [[0.2, 0.2], [1, 0.2], [1, 1], [0.2, 1]], "normalized": True}}, (100, 100))
+    assert zones.lookup(np.array([[10, 10], [50, 50], [90, 90], [10, 90]])).tolist() == [1, 2, 2, 0]
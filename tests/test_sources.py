@@ -0,0 +1,33 @@
+import time
+
+from src.sources import LiveStats, iter_live_frames
+
+class FakeReader:
+    """Stands in for LatestFrameReader: hands out frames captured just now, then ends."""
+    def __init__(self, n):
+        self.n = n
+        self.seq = 0
+
+    def read(self, after_seq):
+        if self.seq >= self.n:
+            return None
+        self.seq = after_seq + 2   # the reader overwrote one frame in between
+        return self.seq, time.monotonic(), None
+
+    def stop(self):
+        pass
+
+def test_slow_frames_shed_the_next_one():
+    stats = LiveStats()
+    for seq, _, _ in iter_live_frames(FakeReader(8), 0.05, stats, report_every_sec=1e9):
+        time.sleep(0.1 if seq == 2 else 0.0)   # only the first frame is over budget
+    assert stats.processed == 4
+    assert stats.over_budget == 1 and stats.shed == 1
+    assert stats.dropped_reader == 4
+    assert not stats.behind
+
+def test_latencies_are_bounded():
+    stats = LiveStats()
+    for _ in iter_live_frames(FakeReader(2 * 3000), 1.0, stats, report_every_sec=1e9):
+        pass
+    assert stats.processed == 3000 and len(stats.latencies) == 1000
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+from src import storage
+from src.utils import logger
+from src.utils.locks import FileLock
+
+def make_alerts(alert_dir, snap_dir, days):
+    """One alert per day, each with its own snapshot in the <date>/<camera>/ layout."""
+    rows = []
+    for i, day in enumerate(days):
+        d = os.path.join(snap_dir, day, "cam1")
+        os.makedirs(d, exist_ok=True)
+        snap = os.path.join(d, f"LOITERING_person_{i}.jpg")
+        with open(snap, "wb") as f:
+            f.write(b"x" * 100)
+        rows.append([f"{day} 10:00:00", f"{i}.00", "LOITERING", "person", i, "1.000", i + 1,
+                     snap, "cam1.avi", "cams", ""])
+    logger.append_rows(rows, storage.log_path(alert_dir))
+
+def archived(alert_dir):
+    conn = storage.open_archive(alert_dir)
+    try:
+        return [dict(r) for r in conn.execute("SELECT * FROM alerts ORDER BY timestamp")]
+    finally:
+        conn.close()
+
+@pytest.fixture
+def dirs(tmp_path):
+    alert_dir, snap_dir = str(tmp_path / "alerts"), str(tmp_path / "snaps")
+    make_alerts(alert_dir, snap_dir, ["2026-01-01", "2026-01-02", "2026-03-01"])
+    return alert_dir, snap_dir
+
+def test_roll_moves_old_records_once(dirs):
+    alert_dir, snap_dir = dirs
+    assert storage.roll("2026-02-01 00:00:00", alert_dir) == 2
+    assert [r["frame"] for r in archived(alert_dir)] == [1, 2]
+    assert [r["timestamp"] for r in storage.read_rows(storage.log_path(alert_dir))] == ["2026-03-01 10:00:00"]
+
+    # rows already in the archive are not inserted twice
+    make_alerts(alert_dir, snap_dir, ["2026-01-01"])
+    storage.roll("2026-02-01 00:00:00", alert_dir)
+    assert len(archived(alert_dir)) == 2
+
+def test_expire_drops_records_and_snapshots_together(dirs):
+    alert_dir, snap_dir = dirs
+    storage.roll("2026-01-02 00:00:00", alert_dir)
+    assert storage.expire("2026-02-01 00:00:00", alert_dir, snap_dir) == (2, 2)
+    assert archived(alert_dir) == []
+    left = [p for _, _, _, p in storage.snap_files(snap_dir)]
+    assert left == [r["snap_path"] for r in storage.read_rows(storage.log_path(alert_dir))]
+
+def test_size_cap_keeps_records_and_clears_their_snapshots(dirs):
+    alert_dir, snap_dir = dirs
+    storage.roll("2026-01-02 00:00:00", alert_dir)
+    assert storage.enforce_size(150, alert_dir, snap_dir) == 2
+    assert [r["snap_path"] for r in archived(alert_dir)] == [""]
+    rows = storage.read_rows(storage.log_path(alert_dir))
+    assert rows[0]["snap_path"] == "" and os.path.exists(rows[1]["snap_path"])
+    assert storage.remove_orphans(0, alert_dir, snap_dir) == (0, [])
+
+def windows_relative_log(tmp_path, names):
+    """An outputs/ tree like the shipped one: flat snaps/ and records written on Windows relative to its parent."""
+    out = tmp_path / "site" / "outputs"
+    (out / "snaps").mkdir(parents=True)
+    for name in names:
+        (out / "snaps" / name).write_bytes(b"jpg")
+    logger.append_rows([["2026-01-02 10:00:00", "1.00", "LOITERING", "person", i, "1.000", i,
+                         f"outputs\\snaps\\{name}", "cam1.avi", "cams", ""] for i, name in enumerate(names)],
+                       str(out / "alerts" / "log.csv"))
+    return str(out / "alerts"), str(out / "snaps")
+
+def test_reshard_rewrites_relative_windows_paths(tmp_path, monkeypatch):
+    alert_dir, snap_dir = windows_relative_log(tmp_path, ["a.jpg", "b.jpg"])
+    monkeypatch.chdir(tmp_path)   # not the pipeline's directory
+    assert storage.reshard(alert_dir, snap_dir) == 2
+    for r in storage.read_rows(storage.log_path(alert_dir)):
+        assert not os.path.isabs(r["snap_path"])
+        assert os.path.isfile(os.path.join(tmp_path, "site", r["snap_path"]))
+    assert storage.remove_orphans(0, alert_dir, snap_dir) == (0, [])
+    assert len(storage.snap_files(snap_dir)) == 2
+
+def test_orphans_kept_when_records_do_not_resolve(tmp_path):
+    alert_dir, snap_dir = windows_relative_log(tmp_path, ["a.jpg"])
+    logger.append_rows([["2026-01-02 10:00:00", "2.00", "LOITERING", "person", 9, "1.000", 9,
+                         "elsewhere/gone.jpg", "cam1.avi", "cams", ""]], storage.log_path(alert_dir))
+    (tmp_path / "site" / "outputs" / "snaps" / "orphan.jpg").write_bytes(b"jpg")
+    n, unresolved = storage.remove_orphans(0, alert_dir, snap_dir)
+    assert n == 0 and len(unresolved) == 1
+    assert len(storage.snap_files(snap_dir)) == 2
+
+def test_keepalive_lock_is_not_broken_while_held(tmp_path):
+    path = str(tmp_path / "log.csv.lock")
+    with FileLock(path, stale_sec=0.4, keepalive=True):
+        time.sleep(1.0)
+        assert time.time() - os.path.getmtime(path) < 0.4
+    assert not os.path.exists(path)
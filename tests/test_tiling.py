@@ -0,0 +1,53 @@
+import numpy as np
+
+from src.detectors.tiling import TiledDetector, nms, plan_crops
+
+def test_tiles_overlap_and_end_flush_with_the_frame():
+    crops = plan_crops((1000, 500), {"mode": "tiles", "tile_size": 640, "tile_overlap": 0.2, "tile_imgsz": 320})
+    assert crops == [(0, 0, 640, 500, 320), (360, 0, 1000, 500, 320)]
+
+def test_roi_mode_uses_normalized_rois():
+    crops = plan_crops((1000, 500), {"mode": "roi", "rois": [[0.5, 0, 1, 0.5]], "normalized": True, "roi_imgsz": 480})
+    assert crops == [(500, 0, 1000, 250, 480)]
+
+def test_nms_keeps_classes_apart():
+    boxes = [[0, 0, 10, 10], [1, 1, 10, 10], [0, 0, 10, 10]]
+    assert nms(boxes, [0.9, 0.8, 0.7], 0.5, classes=[0, 0, 24]).tolist() == [0, 2]
+
+class SceneModel:
+    """Fake backend: sees each object of the scene clipped to the crop it is given, in crop coordinates."""
+    names = {0: "person", 24: "backpack"}
+
+    def __init__(self, objects):
+        self.objects = objects   # (x1, y1, x2, y2, cls)
+
+    def predict(self, images, imgsz, conf=0.25, iou=0.5):
+        out = []
+        for img in images:
+            x0, y0, w, h = img.offset[0], img.offset[1], img.shape[1], img.shape[0]
+            dets = []
+            for x1, y1, x2, y2, cls in self.objects:
+                cx1, cy1, cx2, cy2 = max(x1, x0), max(y1, y0), min(x2, x0 + w), min(y2, y0 + h)
+                if cx2 > cx1 and cy2 > cy1:
+                    # a partial object scores lower than one the tile sees whole
+                    whole = (cx2 - cx1) * (cy2 - cy1) / ((x2 - x1) * (y2 - y1))
+                    dets.append([cx1 - x0, cy1 - y0, cx2 - x0, cy2 - y0, 0.5 + 0.4 * whole, cls])
+            out.append(np.array(dets, np.float32).reshape(-1, 6))
+        return out
+
+class Frame(np.ndarray):
+    """Frame whose crops remember where they were cut from."""
+    def __getitem__(self, key):
+        crop = super().__getitem__(key)
+        crop.offset = (key[1].start or 0, key[0].start or 0)
+        return crop
+
+def test_box_split_across_two_tiles_is_merged():
+    person = (560, 100, 600, 300, 0)   # inside the overlap, whole in both tiles
+    bag = (600, 350, 700, 420, 24)     # cut by the first tile's right edge at x=640
+    det = TiledDetector(SceneModel([person, bag]), {"mode": "tiles", "tile_size": 640, "tile_overlap": 0.2},
+                        (1000, 500))
+    xyxy, conf, cls = det.detect(np.zeros((500, 1000, 3), np.uint8).view(Frame))
+    order = np.argsort(cls)
+    assert cls[order].tolist() == [0, 24]
+    assert xyxy[order].tolist() == [list(person[:4]), list(bag[:4])]